@@ -663,10 +663,9 @@ def chat_with_data():
         
         # Query Perplexity
         # We use the existing client but might want a specific chat model or just use the default
-        response = client.query(full_prompt)
+        answer = client.query_content(full_prompt)
         
-        if response and 'choices' in response:
-            answer = response['choices'][0]['message']['content']
+        if answer is not None:
             return jsonify({
                 'success': True,
                 'response': answer
@@ -24,6 +24,9 @@ RATE_LIMIT_TOKENS_PER_MINUTE = int(os.getenv('RATE_LIMIT_TPM', '10000'))
 CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() == 'true'
 CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', '86400'))  # 24 hours default
 CACHE_DIR = BASE_DIR / 'data' / 'cache'
+# Moneycontrol pages are kept for the day and revalidated with their ETag after that
+MONEYCONTROL_PAGE_CACHE = os.getenv('MONEYCONTROL_PAGE_CACHE', 'true').lower() == 'true'
+MONEYCONTROL_CACHE_DIR = CACHE_DIR / 'moneycontrol'
 
 # Logging Configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -43,6 +46,14 @@ RESEARCH_YEAR = int(os.getenv('RESEARCH_YEAR', '2024'))
 MIN_CONFIDENCE_THRESHOLD = float(os.getenv('MIN_CONFIDENCE_THRESHOLD', '0.7'))
 AUTO_RETRY_FAILED = os.getenv('AUTO_RETRY_FAILED', 'true').lower() == 'true'
 PERPLEXITY_USE_FINANCE_DOMAIN = os.getenv('PERPLEXITY_USE_FINANCE_DOMAIN', 'false').lower() == 'true'
+# Processes for NLP extraction of Perplexity answers (0 = background threads in-process)
+NLP_PROCESS_WORKERS = int(os.getenv('NLP_PROCESS_WORKERS', '0'))
+
+# Excel Output Configuration
+# One extra sheet per (company, quarter, year) on top of the per-company data sheets
+EXCEL_DETAILED_QUARTER_SHEETS = os.getenv('EXCEL_DETAILED_QUARTER_SHEETS', 'false').lower() == 'true'
+# Also write an unstyled <name>_dashboard.xlsx with py-excel-rs (if installed)
+FAST_DASHBOARD_XLSX = os.getenv('FIN_FAST_XLSX', 'false').lower() in ('1', 'true', 'yes')
 
 # Financial Data Configuration
 FINANCIAL_INDICATORS = [
@@ -5,8 +5,9 @@ import json
 import hashlib
 import time
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from config.logging_config import get_logger
+from utils.json_codec import dump_json, load_json
 
 logger = get_logger('cache')
 
@@ -41,6 +42,19 @@ class CacheManager:
         Returns:
             Cached response or None if not found/expired
         """
+        entry = self.get_with_expiry(query_params)
+        return entry[0] if entry else None
+    
+    def get_with_expiry(self, query_params: Dict[str, Any]) -> Optional[Tuple[Dict, float]]:
+        """
+        Retrieve cached response together with when it expires
+        
+        Args:
+            query_params: Query parameters to lookup
+            
+        Returns:
+            (response, expires_at epoch seconds) or None if not found/expired
+        """
         cache_key = self._generate_key(query_params)
         cache_file = self.cache_dir / f"{cache_key}.json"
         
@@ -50,12 +64,13 @@ class CacheManager:
             return None
         
         try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
+            cache_data = load_json(cache_file.read_bytes())
             
-            # Check if expired
+            # Check if expired - entries may carry their own TTL
             cached_time = cache_data.get('timestamp', 0)
-            if time.time() - cached_time > self.ttl_seconds:
+            ttl_seconds = cache_data.get('ttl_seconds', self.ttl_seconds)
+            expires_at = cached_time + ttl_seconds
+            if time.time() > expires_at:
                 logger.debug(f"Cache expired: {cache_key}")
                 cache_file.unlink()  # Delete expired cache
                 self.stats['misses'] += 1
@@ -63,20 +78,23 @@ class CacheManager:
             
             self.stats['hits'] += 1
             logger.debug(f"Cache hit: {cache_key}")
-            return cache_data.get('response')
+            response = cache_data.get('response')
+            return (response, expires_at) if response is not None else None
             
         except Exception as e:
             logger.error(f"Error reading cache: {e}")
             self.stats['misses'] += 1
             return None
     
-    def set(self, query_params: Dict[str, Any], response: Dict):
+    def set(self, query_params: Dict[str, Any], response: Dict,
+            ttl_seconds: Optional[int] = None):
         """
         Store response in cache
         
         Args:
             query_params: Query parameters used as key
             response: Response to cache
+            ttl_seconds: Time to live for this entry (uses the manager default if None)
         """
         cache_key = self._generate_key(query_params)
         cache_file = self.cache_dir / f"{cache_key}.json"
@@ -86,10 +104,11 @@ class CacheManager:
             'query_params': query_params,
             'response': response
         }
+        if ttl_seconds is not None:
+            cache_data['ttl_seconds'] = ttl_seconds
         
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, indent=2)
+            cache_file.write_bytes(dump_json(cache_data))
             logger.debug(f"Cached response: {cache_key}")
         except Exception as e:
             logger.error(f"Error writing cache: {e}")
@@ -2,6 +2,7 @@
 # Advanced extraction of financial data from natural language responses
 
 import re
+import threading
 from typing import Dict, List, Optional, Tuple
 from config.logging_config import get_logger
 
@@ -10,11 +11,29 @@ logger = get_logger('data_extractor')
 class FinancialDataExtractor:
     """Extract structured financial data from natural language text using NLP patterns"""
     
+    # Bump when patterns change so stored extractions are redone (see fix_extraction_issues.py)
+    VERSION = 1
+    
+    # Compiled once per process and shared (read-only) by every instance and thread
+    _shared_patterns: Optional[Dict[str, Tuple[re.Pattern, ...]]] = None
+    _patterns_lock = threading.Lock()
+    
     def __init__(self):
         """Initialize extractor with financial data patterns"""
-        self.patterns = self._build_patterns()
+        self.patterns = self._get_patterns()
+    
+    @classmethod
+    def _get_patterns(cls) -> Dict[str, Tuple[re.Pattern, ...]]:
+        """Build the pattern table on first use, then hand out the shared copy"""
+        if cls._shared_patterns is None:
+            with cls._patterns_lock:
+                if cls._shared_patterns is None:
+                    cls._shared_patterns = {indicator: tuple(patterns)
+                                            for indicator, patterns in cls._build_patterns().items()}
+        return cls._shared_patterns
         
-    def _build_patterns(self) -> Dict[str, List[re.Pattern]]:
+    @staticmethod
+    def _build_patterns() -> Dict[str, List[re.Pattern]]:
         """Build regex patterns for financial indicators"""
         
         # Common number pattern (handles: 1,234.56 or 1234.56)
@@ -2,21 +2,305 @@
 # Create formatted Excel workbooks with financial research data
 
 from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
+from openpyxl.writer.excel import ExcelWriter
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from operator import attrgetter
 from pathlib import Path
-from typing import Dict, List, Optional
+from zipfile import ZipFile, ZIP_DEFLATED
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import csv
+import io
 import re
+import threading
 from config.logging_config import get_logger
+from config.settings import EXCEL_DETAILED_QUARTER_SHEETS, FAST_DASHBOARD_XLSX
+
+try:
+    import xlsxwriter  # optional, faster backend for fresh (non-template) workbooks
+except ImportError:
+    xlsxwriter = None
+
+try:
+    from py_excel_rs import csv_to_xlsx  # optional Rust writer for the plain dashboard table
+except ImportError:
+    csv_to_xlsx = None
 
 logger = get_logger('excel_generator')
 
+# Shared style palette - styles are immutable, so cells reference these directly
+_SIDE_THIN = Side(style='thin')
+_BORDER_THIN = Border(left=_SIDE_THIN, right=_SIDE_THIN, top=_SIDE_THIN, bottom=_SIDE_THIN)
+_ALIGN_CENTER = Alignment(horizontal='center')
+_ALIGN_RIGHT = Alignment(horizontal='right')
+_ALIGN_TITLE = Alignment(horizontal='center', vertical='center')
+_FONT_BOLD = Font(bold=True)
+_FONT_HDR = Font(bold=True, color="FFFFFFFF")
+_FONT_SECTION = Font(size=12, bold=True)
+_FONT_TITLE = Font(size=14, bold=True, color="FFFFFFFF")
+_FONT_TITLE_SUMMARY = Font(size=16, bold=True, color="FFFFFFFF")
+_FONT_TITLE_DASH = Font(size=18, bold=True, color="FFFFFFFF")
+_FONT_OK = Font(color="FF006400", bold=True)
+_FONT_BAD = Font(color="FF8B0000", bold=True)
+_FILL_TITLE = PatternFill("solid", fgColor="FF667EEA")
+_FILL_TITLE_DASH = PatternFill("solid", fgColor="FF2C3E50")
+_FILL_HDR = PatternFill("solid", fgColor="FF764BA2")
+_FILL_HDR_DASH = PatternFill("solid", fgColor="FF34495E")
+_FILL_CONF_HI = PatternFill("solid", fgColor="FFD4EDDA")
+_FILL_CONF_MID = PatternFill("solid", fgColor="FFFFF3CD")
+_FILL_CONF_LO = PatternFill("solid", fgColor="FFF8D7DA")
+
+# Dashboard cell styles, registered once per workbook as NamedStyles
+_DASHBOARD_STYLES = {
+    'dash_header': dict(font=_FONT_HDR, fill=_FILL_HDR_DASH, alignment=_ALIGN_CENTER, border=_BORDER_THIN),
+    'dash_text': dict(border=_BORDER_THIN),
+    'dash_center': dict(alignment=_ALIGN_CENTER, border=_BORDER_THIN),
+    'dash_num': dict(border=_BORDER_THIN, number_format='#,##0.00'),
+    'dash_pct': dict(border=_BORDER_THIN, number_format='0.00%'),
+    'dash_eps': dict(border=_BORDER_THIN, number_format='0.00'),
+    'dash_ok': dict(font=_FONT_OK, alignment=_ALIGN_CENTER, border=_BORDER_THIN),
+    'dash_bad': dict(font=_FONT_BAD, alignment=_ALIGN_CENTER, border=_BORDER_THIN),
+}
+
+# Dashboard layout: (header, column width, named style for metric cells)
+_DASHBOARD_COLUMNS = (
+    ('Company', 25, None), ('Quarter', 15, None), ('Year', 15, None),
+    ('Revenue', 18, 'dash_num'), ('EBITDA', 18, 'dash_num'), ('EBITDA %', 18, 'dash_pct'),
+    ('EBIT', 15, 'dash_num'), ('EBIT %', 15, 'dash_pct'), ('PBT', 15, 'dash_num'),
+    ('PAT', 15, 'dash_num'), ('EPS', 15, 'dash_eps'), ('Status', 15, None)
+)
+_DASHBOARD_METRIC_STYLES = tuple(style for _, _, style in _DASHBOARD_COLUMNS[3:11])
+
+# Numeric rupee format - keeps values numeric instead of per-cell currency strings
+_FMT_RUPEE = '"₹"#,##0.00'
+
+# Confidence colour bands: (minimum confidence, fill, label)
+_CONFIDENCE_BANDS = (
+    (0.9, _FILL_CONF_HI, "✓ High"),
+    (0.7, _FILL_CONF_MID, "⚠ Medium"),
+    (float('-inf'), _FILL_CONF_LO, "⚠ Low"),
+)
+
+
+_SUMMARY_HEADERS = ('Company', 'Quarter', 'Year', 'Indicators', 'Avg Confidence', 'Status')
+
+# Rows of the per-company data sheet: (label, extracted_data key, is_percent)
+_SIMPLE_METRICS = (
+    ('Revenue', 'total_income', False),
+    ('Op. EBITDA%', 'ebitda_margin', True),
+    ('Op. EBIT%', 'ebit_margin', True),
+    ('Op. PBT', 'op_pbt', False),
+    ('PBT', 'pbt', False),
+    ('PAT', 'pat', False),
+    ('EBITDA', 'ebitda', False),
+    ('EBIT', 'ebit', False),
+    ('Interest', 'interest', False),
+    ('Other Income', 'other_income', False),
+)
+
+def _dashboard_sort_key(result: Dict) -> Tuple:
+    """Company, then chronological order"""
+    return (result.get('company', ''), result.get('year', 0), result.get('quarter', ''))
+
+
+def _period_sort_key(result: Dict) -> Tuple:
+    """Chronological order within a company"""
+    return (result.get('year', 0), result.get('quarter', 'Q1'))
+
+
+# Every metric key the generated sheets read from extracted_data
+_KEYS = ('total_income', 'ebitda', 'ebitda_margin', 'ebit', 'ebit_margin', 'op_pbt', 'pbt',
+         'pat', 'net_profit', 'eps', 'interest', 'other_income')
+
+
+def _metric_values(data: Dict) -> Dict[str, Optional[float]]:
+    """Pull every _KEYS value out of extracted_data in one pass (None where missing)"""
+    return {key: data[key].get('value') if key in data else None for key in _KEYS}
+
+
+# Margins derivable from their numerator and revenue (total_income)
+_MARGIN_NUMERATORS = {'ebitda_margin': 'ebitda', 'ebit_margin': 'ebit'}
+_DERIVED_KEYS = ('op_pbt', *_MARGIN_NUMERATORS)
+
+
+def _derive_metric(key: str, vals: Dict[str, Optional[float]]) -> Optional[float]:
+    """
+    Compute a derived metric from its components
+    
+    Args:
+        key: 'op_pbt', 'ebitda_margin' or 'ebit_margin'
+        vals: Metric values as returned by _metric_values
+        
+    Returns:
+        Op. PBT (EBIT - Interest) or a margin in percent, None if a component is missing
+    """
+    if key == 'op_pbt':
+        ebit, interest = vals['ebit'], vals['interest']
+        return ebit - interest if ebit is not None and interest is not None else None
+    if key in _MARGIN_NUMERATORS:
+        num, den = vals[_MARGIN_NUMERATORS[key]], vals['total_income']
+        return (num / den) * 100 if num is not None and den else None
+    return None
+
+
+def _normalize_pct(raw: Optional[float], num: Optional[float], den: Optional[float]) -> Optional[float]:
+    """
+    Normalize a margin to a fraction, deriving it from num/den when not reported
+    
+    Args:
+        raw: Reported margin, either as percent (15.5) or fraction (0.155)
+        num: Numerator used when raw is missing (e.g. EBITDA)
+        den: Denominator used when raw is missing (revenue)
+        
+    Returns:
+        Margin as a fraction, or None if it cannot be determined
+    """
+    if raw is not None:
+        return raw / 100 if raw > 1 else raw
+    if num and den:
+        return num / den
+    return None
+
+
+# Sheet XML is mostly distinct numbers; level 1 deflate spends less time in the
+# compressor for ~10% larger files (openpyxl always uses the zlib default of 6)
+_ZIP_COMPRESSLEVEL = 1
+
+
+def _write_xlsx(workbook: Workbook, filepath: Path, compresslevel: int = _ZIP_COMPRESSLEVEL):
+    """Equivalent of Workbook.save() with a configurable deflate level"""
+    if workbook.read_only:
+        raise TypeError("Workbook is read-only")
+    if workbook.write_only and not workbook.worksheets:
+        workbook.create_sheet()
+    
+    archive = ZipFile(filepath, 'w', ZIP_DEFLATED, allowZip64=True, compresslevel=compresslevel)
+    workbook.properties.modified = datetime.now(tz=timezone.utc).replace(tzinfo=None)
+    ExcelWriter(workbook, archive).save()
+
+
+def _xlsxwriter_props(font: Optional[Font] = None, fill: Optional[PatternFill] = None,
+                      alignment: Optional[Alignment] = None, border: Optional[Border] = None,
+                      number_format: Optional[str] = None) -> Dict:
+    """Translate the openpyxl style palette into xlsxwriter format properties"""
+    props = {}
+    if font is not None:
+        if font.b:
+            props['bold'] = True
+        if font.sz:
+            props['font_size'] = font.sz
+        if font.color is not None and isinstance(font.color.rgb, str):
+            props['font_color'] = '#' + font.color.rgb[-6:]
+    if fill is not None:
+        props['pattern'] = 1
+        props['bg_color'] = '#' + fill.fgColor.rgb[-6:]
+    if alignment is not None:
+        if alignment.horizontal:
+            props['align'] = alignment.horizontal
+        if alignment.vertical == 'center':
+            props['valign'] = 'vcenter'
+    if border is not None:
+        props['border'] = 1
+    if number_format is not None:
+        props['num_format'] = number_format
+    return props
+
+
+_save_executor: Optional[ThreadPoolExecutor] = None
+_save_executor_lock = threading.Lock()
+
+
+def _get_save_executor() -> ThreadPoolExecutor:
+    """Shared background executor for generate_excel_async"""
+    global _save_executor
+    with _save_executor_lock:
+        if _save_executor is None:
+            _save_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='excel-save')
+        return _save_executor
+
+
+class PreRow(NamedTuple):
+    """One research result flattened for the dashboard and summary sheets"""
+    company: Any
+    quarter: Any
+    year: Any
+    status: str
+    extracted_data: Dict
+    revenue: Optional[float]
+    ebitda: Optional[float]
+    ebitda_margin: Optional[float]
+    ebit: Optional[float]
+    ebit_margin: Optional[float]
+    pbt: Optional[float]
+    pat: Optional[float]
+    eps: Optional[float]
+    avg_conf: float
+    n_indicators: int
+    sort_key: Tuple
+
+    def dashboard_metrics(self) -> Tuple[Optional[float], ...]:
+        """Metric values in dashboard column order (Revenue .. EPS)"""
+        return (self.revenue, self.ebitda, self.ebitda_margin, self.ebit,
+                self.ebit_margin, self.pbt, self.pat, self.eps)
+
+
+def _sorted_by_key(results: List[Dict], key_func) -> List[Dict]:
+    """Sort results with each key extracted exactly once up front"""
+    keys = [key_func(result) for result in results]
+    order = sorted(range(len(results)), key=keys.__getitem__)
+    return [results[i] for i in order]
+
+
+# Map standardized keys to likely display labels in uploaded templates
+_METRIC_MAP = {
+    'total_income': ['revenue', 'total income', 'sales', 'top line'],
+    'ebitda': ['ebitda', 'operating profit'],
+    'ebitda_margin': ['ebitda %', 'op. ebitda%', 'ebitda margin', 'op. ebitda %'],
+    'ebit': ['ebit', 'operating ebit'],
+    'ebit_margin': ['ebit %', 'op. ebit%', 'ebit margin', 'op. ebit %'],
+    'op_pbt': ['op. pbt', 'op pbt', 'operating pbt'],
+    'pbt': ['pbt', 'profit before tax'],
+    'net_profit': ['pat', 'net profit', 'profit after tax'],
+    'eps': ['eps', 'earning per share'],
+    'interest': ['interest', 'finance cost'],
+    'other_income': ['other income', 'non-operating income']
+}
+
+# Inverted index: label keyword -> metric key
+_METRIC_TRIE = {keyword: key for key, keywords in _METRIC_MAP.items() for keyword in keywords}
+
+# Longest keywords first so 'op. ebitda %' wins over 'ebitda' and 'op. pbt' over 'pbt'
+_METRIC_KEYWORDS = tuple(sorted(_METRIC_TRIE, key=len, reverse=True))
+_METRIC_RE = re.compile('|'.join(re.escape(keyword) for keyword in _METRIC_KEYWORDS))
+
+# Quarter header such as 'Q1 FY24' or 'FY24Q3' (matched against lowercased text)
+_QUARTER_RE = re.compile(r'(?<![a-z])q([1-4])(?!\d)')
+
+
+def _confidence_band(confidence: float) -> Tuple[PatternFill, str]:
+    """Return the (fill, label) band for a confidence score"""
+    return next((fill, label) for threshold, fill, label in _CONFIDENCE_BANDS if confidence >= threshold)
+
+
 class ExcelGenerator:
     """Generate formatted Excel workbooks from research data"""
     
-    def __init__(self):
-        """Initialize Excel generator"""
+    def __init__(self, detailed_per_quarter_sheet: Optional[bool] = None):
+        """
+        Initialize Excel generator
+        
+        Args:
+            detailed_per_quarter_sheet: Also emit one sheet per (company, quarter, year);
+                defaults to EXCEL_DETAILED_QUARTER_SHEETS
+        """
         self.workbook = None
+        self._sheet_names = set()  # titles in self.workbook, kept in sync by _create_sheet
+        if detailed_per_quarter_sheet is None:
+            detailed_per_quarter_sheet = EXCEL_DETAILED_QUARTER_SHEETS
+        self.detailed_per_quarter_sheet = detailed_per_quarter_sheet
         
     def create_workbook(self, research_results: List[Dict], template_path: Optional[str] = None) -> Workbook:
         """
@@ -31,187 +315,88 @@ class ExcelGenerator:
         """
         if template_path and Path(template_path).exists():
             try:
+                # Template filling edits existing cells, so it needs a regular workbook
                 self.workbook = load_workbook(template_path)
+                self._sheet_names = set(self.workbook.sheetnames)
                 self._fill_workbook_from_template(research_results)
                 return self.workbook
             except Exception as e:
                 logger.error(f"Failed to load template {template_path}: {e}")
                 # Fallback to creating new
-                self.workbook = Workbook()
-        else:
-            self.workbook = Workbook()
         
-        # Default creation logic (fallback or new)
-        if 'Sheet' in self.workbook.sheetnames:
-            del self.workbook['Sheet']
+        # Default creation logic (fallback or new) - sheets are streamed row by row
+        self.workbook = Workbook(write_only=True)
+        self._sheet_names = set()
+        
+        # Walk the results once; dashboard and summary share the flattened rows
+        pre_rows = self._preprocess_results(research_results)
         
         # Create Consolidated Dashboard (First Sheet)
-        self._create_consolidated_dashboard(research_results)
+        self._create_consolidated_dashboard(pre_rows)
+        
+        for company, company_results in self._group_by_company(research_results).items():
+            self._create_simple_company_sheet(company, company_results)
         
-        self._create_summary_sheet(research_results)
+        self._create_summary_sheet(pre_rows)
         
-        # Group by company to avoid dupes if filling generic sheets
-        companies = set(r.get('company') for r in research_results)
-        if not template_path:
-             for result in research_results:
+        # The [Company]_Data sheets already pivot every quarter; per-result sheets are opt-in
+        if self.detailed_per_quarter_sheet and not template_path:
+            for result in research_results:
                 self._create_company_sheet(result)
         
-        logger.info(f"Created workbook with {len(self.workbook.sheetnames)} sheets")
+        logger.info(f"Created workbook with {len(self._sheet_names)} sheets")
         return self.workbook
 
-    def _create_consolidated_dashboard(self, results: List[Dict]):
-        """Create a consolidated dashboard sheet with all companies"""
-        ws = self.workbook.create_sheet("Consolidated Dashboard", 0)
-        
-        # Title
-        ws['A1'] = "Consolidated Financial Dashboard"
-        ws['A1'].font = Font(size=18, bold=True, color="FFFFFF")
-        ws['A1'].fill = PatternFill(start_color="2c3e50", end_color="2c3e50", fill_type="solid")
-        ws.merge_cells('A1:L1')
-        ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
-        ws.row_dimensions[1].height = 35
-        
-        # Headers
-        headers = [
-            'Company', 'Quarter', 'Year', 
-            'Revenue', 'EBITDA', 'EBITDA %', 
-            'EBIT', 'EBIT %', 'PBT', 'PAT', 
-            'EPS', 'Status'
-        ]
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="34495e", end_color="34495e", fill_type="solid")
-            cell.alignment = Alignment(horizontal='center')
-            
-            # Set column width
-            width = 15
-            if header == 'Company': width = 25
-            elif 'Revenue' in header or 'EBITDA' in header: width = 18
-            ws.column_dimensions[get_column_letter(col)].width = width
+    def _cell(self, ws, value, font: Optional[Font] = None, fill: Optional[PatternFill] = None,
+              alignment: Optional[Alignment] = None, border: Optional[Border] = None,
+              number_format: Optional[str] = None, style: Optional[str] = None) -> WriteOnlyCell:
+        """Build a styled cell for ws.append() - works for write-only and regular sheets"""
+        cell = WriteOnlyCell(ws, value=value)
+        if style is not None:
+            # Named style first; explicit attributes below override it
+            cell.style = style
+        if font is not None:
+            cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        if alignment is not None:
+            cell.alignment = alignment
+        if border is not None:
+            cell.border = border
+        if number_format is not None:
+            cell.number_format = number_format
+        return cell
 
-        # Sort results by Company, then Year, then Quarter
-        sorted_results = sorted(results, key=lambda x: (x.get('company', ''), x.get('year', 0), x.get('quarter', '')))
+    def _create_sheet(self, title: str, index: Optional[int] = None):
+        """
+        Create a worksheet, suffixing the title if it is already taken
         
-        # Data Rows
-        row = 4
-        for res in sorted_results:
-            data = res.get('extracted_data', {})
-            
-            # Helper to get value safely
-            def get_val(key):
-                if key in data:
-                    return data[key].get('value')
-                return None
-
-            # 1. Company
-            ws.cell(row=row, column=1, value=res.get('company', 'N/A'))
-            
-            # 2. Quarter
-            ws.cell(row=row, column=2, value=res.get('quarter', 'N/A'))
-            ws.cell(row=row, column=2).alignment = Alignment(horizontal='center')
-            
-            # 3. Year
-            ws.cell(row=row, column=3, value=res.get('year', 'N/A'))
-            ws.cell(row=row, column=3).alignment = Alignment(horizontal='center')
+        Args:
+            title: Desired sheet title
+            index: Optional position of the new sheet
             
-            # 4. Revenue
-            rev = get_val('total_income')
-            if rev:
-                c = ws.cell(row=row, column=4, value=rev)
-                c.number_format = '#,##0.00'
-            else:
-                ws.cell(row=row, column=4, value='--').alignment = Alignment(horizontal='center')
-
-            # 5. EBITDA
-            ebitda = get_val('ebitda')
-            if ebitda:
-                c = ws.cell(row=row, column=5, value=ebitda)
-                c.number_format = '#,##0.00'
-            else:
-                ws.cell(row=row, column=5, value='--').alignment = Alignment(horizontal='center')
-
-            # 6. EBITDA %
-            ebitda_margin = get_val('ebitda_margin')
-            if ebitda_margin:
-                c = ws.cell(row=row, column=6, value=ebitda_margin/100 if ebitda_margin > 1 else ebitda_margin) # Handle both 15.5 and 0.155
-                c.number_format = '0.00%'
-            elif ebitda and rev:
-                try:
-                    val = ebitda / rev
-                    c = ws.cell(row=row, column=6, value=val)
-                    c.number_format = '0.00%'
-                except:
-                    ws.cell(row=row, column=6, value='--')
-            else:
-                ws.cell(row=row, column=6, value='--').alignment = Alignment(horizontal='center')
-
-            # 7. EBIT
-            ebit = get_val('ebit')
-            if ebit:
-                c = ws.cell(row=row, column=7, value=ebit)
-                c.number_format = '#,##0.00'
-            else:
-                ws.cell(row=row, column=7, value='--').alignment = Alignment(horizontal='center')
-
-            # 8. EBIT %
-            ebit_margin = get_val('ebit_margin')
-            if ebit_margin:
-                c = ws.cell(row=row, column=8, value=ebit_margin/100 if ebit_margin > 1 else ebit_margin)
-                c.number_format = '0.00%'
-            elif ebit and rev:
-                try:
-                    val = ebit / rev
-                    c = ws.cell(row=row, column=8, value=val)
-                    c.number_format = '0.00%'
-                except:
-                    ws.cell(row=row, column=8, value='--')
-            else:
-                ws.cell(row=row, column=8, value='--').alignment = Alignment(horizontal='center')
-
-            # 9. PBT
-            pbt = get_val('pbt')
-            if pbt:
-                c = ws.cell(row=row, column=9, value=pbt)
-                c.number_format = '#,##0.00'
-            else:
-                ws.cell(row=row, column=9, value='--').alignment = Alignment(horizontal='center')
-
-            # 10. PAT
-            pat = get_val('pat') or get_val('net_profit')
-            if pat:
-                c = ws.cell(row=row, column=10, value=pat)
-                c.number_format = '#,##0.00'
-            else:
-                ws.cell(row=row, column=10, value='--').alignment = Alignment(horizontal='center')
-
-            # 11. EPS
-            eps = get_val('eps')
-            if eps:
-                c = ws.cell(row=row, column=11, value=eps)
-                c.number_format = '0.00'
-            else:
-                ws.cell(row=row, column=11, value='--').alignment = Alignment(horizontal='center')
-
-            # 12. Status
-            status = res.get('status', 'unknown')
-            c = ws.cell(row=row, column=12, value=status.upper())
-            c.alignment = Alignment(horizontal='center')
-            if status == 'success':
-                c.font = Font(color="006400", bold=True)
-            else:
-                c.font = Font(color="8B0000", bold=True)
-
-            row += 1
-        
-        # Add borders
-        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-        for r in range(3, row):
-            for c in range(1, 13):
-                ws.cell(row=r, column=c).border = thin_border
-        """Fill existing workbook using smart matching"""
-        # Group results by company
+        Returns:
+            The new worksheet
+        """
+        sheet_name = title
+        suffix = 1
+        while sheet_name in self._sheet_names:
+            sheet_name = f"{title}_{suffix}"
+            suffix += 1
+        self._sheet_names.add(sheet_name)
+        return self.workbook.create_sheet(sheet_name, index)
+
+    @staticmethod
+    def _merge(ws, cell_range: str):
+        """Merge a cell range on either a write-only or a regular worksheet"""
+        if hasattr(ws, 'merge_cells'):
+            ws.merge_cells(cell_range)
+        else:
+            ws.merged_cells.add(cell_range)
+
+    @staticmethod
+    def _group_by_company(results: List[Dict]) -> Dict[str, List[Dict]]:
+        """Group research results by company name"""
         company_data = {}
         for res in results:
             company = res.get('company')
@@ -219,10 +404,102 @@ class ExcelGenerator:
             if company not in company_data:
                 company_data[company] = []
             company_data[company].append(res)
+        return company_data
+
+    @staticmethod
+    def _preprocess_results(results: List[Dict]) -> List['PreRow']:
+        """
+        Flatten research results into PreRows in a single pass
+        
+        Args:
+            results: List of research result dictionaries
+            
+        Returns:
+            One PreRow per result, in input order
+        """
+        pre_rows = []
+        for res in results:
+            data = res.get('extracted_data', {})
+            vals = _metric_values(data)
+            
+            rev = vals['total_income']
+            ebitda = vals['ebitda']
+            ebit = vals['ebit']
+            avg_conf = sum(v['confidence'] for v in data.values()) / len(data) if data else 0
+            
+            pre_rows.append(PreRow(
+                company=res.get('company', 'N/A'),
+                quarter=res.get('quarter', 'N/A'),
+                year=res.get('year', 'N/A'),
+                status=res.get('status', 'unknown'),
+                extracted_data=data,
+                revenue=rev,
+                ebitda=ebitda,
+                ebitda_margin=_normalize_pct(vals['ebitda_margin'], ebitda, rev),
+                ebit=ebit,
+                ebit_margin=_normalize_pct(vals['ebit_margin'], ebit, rev),
+                pbt=vals['pbt'],
+                pat=vals['pat'] or vals['net_profit'],
+                eps=vals['eps'],
+                avg_conf=avg_conf,
+                n_indicators=len(data),
+                sort_key=_dashboard_sort_key(res),
+            ))
+        return pre_rows
+
+    def _create_consolidated_dashboard(self, rows: List['PreRow']):
+        """Create a consolidated dashboard sheet with all companies"""
+        ws = self._create_sheet("Consolidated Dashboard", 0)
+        
+        self._register_named_styles()
+        
+        # Dimensions must be set before any row is streamed
+        ws.row_dimensions[1].height = 35
+        for col, (_, width, _) in enumerate(_DASHBOARD_COLUMNS, 1):
+            ws.column_dimensions[get_column_letter(col)].width = width
+        
+        # Title
+        ws.append([self._cell(ws, "Consolidated Financial Dashboard", font=_FONT_TITLE_DASH,
+                              fill=_FILL_TITLE_DASH, alignment=_ALIGN_TITLE)])
+        self._merge(ws, 'A1:L1')
+        ws.append([])
+        
+        ws.append([self._cell(ws, header, style='dash_header') for header, _, _ in _DASHBOARD_COLUMNS])
+
+        # Sort results by Company, then Year, then Quarter
+        sorted_rows = sorted(rows, key=attrgetter('sort_key'))
+        
+        def put(value, style):
+            return self._cell(ws, value, style=style) if value else self._cell(ws, '--', style='dash_center')
+        
+        # Data Rows
+        for row in sorted_rows:
+            row_cells = [
+                self._cell(ws, row.company, style='dash_text'),
+                self._cell(ws, row.quarter, style='dash_center'),
+                self._cell(ws, row.year, style='dash_center'),
+            ]
+            row_cells.extend(put(value, style)
+                             for value, style in zip(row.dashboard_metrics(), _DASHBOARD_METRIC_STYLES))
+            row_cells.append(self._cell(ws, row.status.upper(),
+                                        style='dash_ok' if row.status == 'success' else 'dash_bad'))
+            ws.append(row_cells)
+
+    def _register_named_styles(self):
+        """Register the dashboard's named styles on the current workbook (once)"""
+        registered = set(self.workbook.named_styles)
+        for name, attrs in _DASHBOARD_STYLES.items():
+            if name not in registered:
+                self.workbook.add_named_style(NamedStyle(name=name, **attrs))
+
+    def _fill_workbook_from_template(self, results: List[Dict]):
+        """Fill existing workbook using smart matching"""
+        # Group results by company
+        company_data = self._group_by_company(results)
 
         # Identify template sheet (Sheet 3 or "Company-wise" or index 2)
         template_sheet = None
-        if len(self.workbook.sheetnames) >= 3:
+        if len(self.workbook.worksheets) >= 3:
              template_sheet = self.workbook.worksheets[2] # Index 2 = Sheet 3
         else:
              template_sheet = self.workbook.worksheets[-1] # Last sheet
@@ -231,7 +508,7 @@ class ExcelGenerator:
         for company, company_results in company_data.items():
             # 1. Fill Summary/Sheet 1 if possible
             # Scan first sheet for company name row
-            if len(self.workbook.sheetnames) > 0:
+            if self.workbook.worksheets:
                  self._smart_fill_sheet(self.workbook.worksheets[0], company, company_results)
 
             # 2. Create detailed sheet from template - REMOVED to avoid duplicates
@@ -250,25 +527,16 @@ class ExcelGenerator:
         """
         logger.info(f"Filling sheet '{ws.title}' for company '{company}' with {len(results)} results")
         
-        # Map standardized keys to likely display labels
-        metric_map = {
-            'total_income': ['revenue', 'total income', 'sales', 'top line'],
-            'ebitda': ['ebitda', 'operating profit'],
-            'ebitda_margin': ['ebitda %', 'op. ebitda%', 'ebitda margin', 'op. ebitda %'],
-            'ebit': ['ebit', 'operating ebit'],
-            'ebit_margin': ['ebit %', 'op. ebit%', 'ebit margin', 'op. ebit %'],
-            'op_pbt': ['op. pbt', 'op pbt', 'operating pbt'],
-            'pbt': ['pbt', 'profit before tax'],
-            'net_profit': ['pat', 'net profit', 'profit after tax'],
-            'eps': ['eps', 'earning per share'],
-            'interest': ['interest', 'finance cost'],
-            'other_income': ['other income', 'non-operating income']
-        }
-
         # Index the sheet headers (first 10 rows, first 20 cols)
         rows_to_scan = 20
         cols_to_scan = 20
         
+        # Read the whole scan window in one pass and lowercase each string once
+        rows_snapshot = list(ws.iter_rows(min_row=1, max_row=rows_to_scan + 19,
+                                          min_col=1, max_col=cols_to_scan - 1, values_only=True))
+        rows_lower = [[val.lower() if isinstance(val, str) else None for val in row]
+                      for row in rows_snapshot]
+        
         # Locate Quarter columns
         quarter_cols = {} # { 'Q1': col_idx, 'Q2': col_idx ... }
         
@@ -276,15 +544,12 @@ class ExcelGenerator:
         header_row = None
         
         for r in range(1, rows_to_scan):
-            row_values = []
-            for c in range(1, cols_to_scan):
-                val = ws.cell(row=r, column=c).value
-                if isinstance(val, str):
-                    val_lower = val.lower()
-                    if 'q1' in val_lower: quarter_cols['Q1'] = c
-                    elif 'q2' in val_lower: quarter_cols['Q2'] = c
-                    elif 'q3' in val_lower: quarter_cols['Q3'] = c
-                    elif 'q4' in val_lower: quarter_cols['Q4'] = c
+            for c, val_lower in enumerate(rows_lower[r - 1], 1):
+                if val_lower is None:
+                    continue
+                match = _QUARTER_RE.search(val_lower)
+                if match:
+                    quarter_cols[f"Q{match.group(1)}"] = c
             
             if len(quarter_cols) >= 1:
                 header_row = r
@@ -298,23 +563,28 @@ class ExcelGenerator:
         
         logger.info(f"Found quarter headers at row {header_row}: {quarter_cols}")
 
+        # Index merged ranges by row once, instead of scanning every range on each write
+        merged_by_row = {}
+        for merged_range in ws.merged_cells.ranges:
+            for merged_row in range(merged_range.min_row, merged_range.max_row + 1):
+                merged_by_row.setdefault(merged_row, []).append(merged_range)
+
         # Iterate rows to find metrics
         for r in range(header_row + 1, rows_to_scan + 20): # Scan deeper for metrics
             # Check first few columns for metric label
             metric_found = None
             cell_val = None
             
-            for c in range(1, 5): # Metric label usually in first columns
-                val = ws.cell(row=r, column=c).value
-                if isinstance(val, str):
-                    val_lower = val.lower().strip()
-                    # Check against map
-                    for key, keywords in metric_map.items():
-                        if any(k in val_lower for k in keywords):
-                            metric_found = key
-                            cell_val = val
-                            break
-                if metric_found: break
+            for c in range(4): # Metric label usually in first columns
+                val_lower = rows_lower[r - 1][c]
+                if val_lower is None:
+                    continue
+                # Check against map
+                match = _METRIC_RE.search(val_lower)
+                if match:
+                    metric_found = _METRIC_TRIE[match.group()]
+                    cell_val = rows_snapshot[r - 1][c]
+                    break
             
             if metric_found:
                 logger.info(f"Found metric '{metric_found}' at row {r}, label: '{cell_val}'")
@@ -333,35 +603,18 @@ class ExcelGenerator:
                         
                         # Handle derived metrics if missing
                         if value is None:
-                             if metric_found == 'ebitda_margin' and 'ebitda' in data and 'total_income' in data:
-                                   try:
-                                       value = (data['ebitda']['value'] / data['total_income']['value']) * 100
-                                   except:
-                                       pass
-                             elif metric_found == 'ebit_margin' and 'ebit' in data and 'total_income' in data:
-                                   try:
-                                       value = (data['ebit']['value'] / data['total_income']['value']) * 100
-                                   except:
-                                       pass
-                             # Op PBT - always calculate from EBIT - Interest
-                             elif metric_found == 'op_pbt' and 'ebit' in data and 'interest' in data:
-                                    try:
-                                        value = data['ebit']['value'] - data['interest']['value']
-                                    except:
-                                        pass
+                            value = _derive_metric(metric_found, _metric_values(data))
 
                         if value is not None:
                             try:
                                 # Check if cell is part of a merged range and unmerge if needed
-                                from openpyxl.worksheet.cell_range import CellRange
-                                cell_coordinate = ws.cell(row=r, column=col_idx).coordinate
-                                
-                                # Find and unmerge if this cell is in a merged range
-                                for merged_range in list(ws.merged_cells.ranges):
-                                    if cell_coordinate in merged_range:
-                                        ws.unmerge_cells(str(merged_range))
-                                        logger.debug(f"  Unmerged {merged_range} to write to {cell_coordinate}")
-                                        break
+                                merged_range = next((m for m in merged_by_row.get(r, ())
+                                                     if m.min_col <= col_idx <= m.max_col), None)
+                                if merged_range is not None:
+                                    ws.unmerge_cells(str(merged_range))
+                                    for merged_row in range(merged_range.min_row, merged_range.max_row + 1):
+                                        merged_by_row[merged_row].remove(merged_range)
+                                    logger.debug(f"  Unmerged {merged_range} to write to {get_column_letter(col_idx)}{r}")
                                 
                                 # Now write the value
                                 ws.cell(row=r, column=col_idx, value=value)
@@ -372,52 +625,39 @@ class ExcelGenerator:
                             logger.debug(f"  MISS Could not get value for {metric_found} in {q_label}")
 
 
-    def _create_summary_sheet(self, results: List[Dict]):
+    def _create_summary_sheet(self, rows: List['PreRow']):
         """Create summary overview sheet"""
-        ws = self.workbook.create_sheet("Summary", 0)
+        ws = self._create_sheet("Summary", 0)
         
-        # Title
-        ws['A1'] = "Financial Research Summary"
-        ws['A1'].font = Font(size=16, bold=True, color="FFFFFF")
-        ws['A1'].fill = PatternFill(start_color="667eea", end_color="667eea", fill_type="solid")
-        ws.merge_cells('A1:F1')
-        ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
+        # Auto-adjust column widths
+        for col in range(1, 7):
+            ws.column_dimensions[get_column_letter(col)].width = 18
         ws.row_dimensions[1].height = 30
         
+        # Title
+        ws.append([self._cell(ws, "Financial Research Summary", font=_FONT_TITLE_SUMMARY,
+                              fill=_FILL_TITLE, alignment=_ALIGN_TITLE)])
+        self._merge(ws, 'A1:F1')
+        ws.append([])
+        
         # Headers
-        headers = ['Company', 'Quarter', 'Year', 'Indicators', 'Avg Confidence', 'Status']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="764ba2", end_color="764ba2", fill_type="solid")
-            cell.alignment = Alignment(horizontal='center')
+        ws.append([self._cell(ws, header, font=_FONT_HDR, fill=_FILL_HDR,
+                              alignment=_ALIGN_CENTER)
+                   for header in _SUMMARY_HEADERS])
         
         # Data rows
-        for row_idx, result in enumerate(results, 4):
-            extracted = result.get('extracted_data', {})
-            avg_conf = sum(v['confidence'] for v in extracted.values()) / len(extracted) if extracted else 0
-            
-            ws.cell(row=row_idx, column=1, value=result.get('company', 'N/A'))
-            ws.cell(row=row_idx, column=2, value=result.get('quarter', 'N/A'))
-            ws.cell(row=row_idx, column=3, value=result.get('year', 'N/A'))
-            ws.cell(row=row_idx, column=4, value=len(extracted))
-            
-            conf_cell = ws.cell(row=row_idx, column=5, value=f"{avg_conf*100:.1f}%")
+        for row in rows:
             # Color code confidence
-            if avg_conf >= 0.9:
-                conf_cell.fill = PatternFill(start_color="d4edda", end_color="d4edda", fill_type="solid")
-            elif avg_conf >= 0.7:
-                conf_cell.fill = PatternFill(start_color="fff3cd", end_color="fff3cd", fill_type="solid")
-            else:
-                conf_cell.fill = PatternFill(start_color="f8d7da", end_color="f8d7da", fill_type="solid")
+            conf_fill, _ = _confidence_band(row.avg_conf)
             
-            status_cell = ws.cell(row=row_idx, column=6, value=result.get('status', 'unknown'))
-            if result.get('status') == 'success':
-                status_cell.fill = PatternFill(start_color="d4edda", end_color="d4edda", fill_type="solid")
-        
-        # Auto-adjust column widths
-        for col in range(1, 7):
-            ws.column_dimensions[get_column_letter(col)].width = 18
+            ws.append([
+                row.company,
+                row.quarter,
+                row.year,
+                row.n_indicators,
+                self._cell(ws, row.avg_conf, fill=conf_fill, number_format='0.0%'),
+                self._cell(ws, row.status, fill=_FILL_CONF_HI if row.status == 'success' else None),
+            ])
     
     def _create_company_sheet(self, result: Dict):
         """Create detailed sheet for individual company"""
@@ -426,197 +666,146 @@ class ExcelGenerator:
         year = result.get('year', 2024)
         
         sheet_name = f"{company[:25]}_{quarter}_{year}"  # Truncate if too long
-        ws = self.workbook.create_sheet(sheet_name)
+        ws = self._create_sheet(sheet_name)
         
-        # Header
-        ws['A1'] = f"{company} - {quarter} {year}"
-        ws['A1'].font = Font(size=14, bold=True, color="FFFFFF")
-        ws['A1'].fill = PatternFill(start_color="667eea", end_color="667eea", fill_type="solid")
-        ws.merge_cells('A1:D1')
-        ws['A1'].alignment = Alignment(horizontal='center')
+        # Auto-adjust columns
+        ws.column_dimensions['A'].width = 25
+        ws.column_dimensions['B'].width = 18
+        ws.column_dimensions['C'].width = 15
+        ws.column_dimensions['D'].width = 15
         ws.row_dimensions[1].height = 25
         
+        # Header
+        ws.append([self._cell(ws, f"{company} - {quarter} {year}", font=_FONT_TITLE,
+                              fill=_FILL_TITLE, alignment=_ALIGN_CENTER)])
+        self._merge(ws, 'A1:D1')
+        ws.append([])
+        
         # Context confidence
         context_conf = result.get('context_confidence', 0)
-        ws['A3'] = "Context Confidence:"
-        ws['B3'] = f"{context_conf*100:.1f}%"
-        ws['A3'].font = Font(bold=True)
+        ws.append([self._cell(ws, "Context Confidence:", font=_FONT_BOLD), f"{context_conf*100:.1f}%"])
+        ws.append([])
         
         # Extracted indicators header
-        ws['A5'] = "Financial Indicators"
-        ws['A5'].font = Font(size=12, bold=True)
-        ws.merge_cells('A5:D5')
+        ws.append([self._cell(ws, "Financial Indicators", font=_FONT_SECTION)])
+        self._merge(ws, 'A5:D5')
         
         # Table headers
+        border = _BORDER_THIN
         indicator_headers = ['Indicator', 'Value (₹ Cr)', 'Confidence', 'Status']
-        for col, header in enumerate(indicator_headers, 1):
-            cell = ws.cell(row=6, column=col, value=header)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="764ba2", end_color="764ba2", fill_type="solid")
-            cell.alignment = Alignment(horizontal='center')
+        ws.append([self._cell(ws, header, font=_FONT_HDR, fill=_FILL_HDR,
+                              alignment=_ALIGN_CENTER, border=border)
+                   for header in indicator_headers])
         
         # Indicator data
         extracted = result.get('extracted_data', {})
-        row = 7
         for indicator, data in extracted.items():
-            ws.cell(row=row, column=1, value=indicator.replace('_', ' ').title())
-            ws.cell(row=row, column=2, value=f"₹{data['value']:,.2f}")
-            
             conf = data['confidence']
-            conf_cell = ws.cell(row=row, column=3, value=f"{conf*100:.0f}%")
             
             # Color code confidence
-            if conf >= 0.9:
-                conf_cell.fill = PatternFill(start_color="d4edda", end_color="d4edda", fill_type="solid")
-                ws.cell(row=row, column=4, value="✓ High")
-            elif conf >= 0.7:
-                conf_cell.fill = PatternFill(start_color="fff3cd", end_color="fff3cd", fill_type="solid")
-                ws.cell(row=row, column=4, value="⚠ Medium")
-            else:
-                conf_cell.fill = PatternFill(start_color="f8d7da", end_color="f8d7da", fill_type="solid")
-                ws.cell(row=row, column=4, value="⚠ Low")
+            conf_fill, conf_label = _confidence_band(conf)
             
-            row += 1
-        
-        # Add borders
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        for row_idx in range(6, row):
-            for col_idx in range(1, 5):
-                ws.cell(row=row_idx, column=col_idx).border = thin_border
-        
-        # Auto-adjust columns
-        ws.column_dimensions['A'].width = 25
-        ws.column_dimensions['B'].width = 18
-        ws.column_dimensions['C'].width = 15
-        ws.column_dimensions['D'].width = 15
+            ws.append([
+                self._cell(ws, indicator.replace('_', ' ').title(), border=border),
+                self._cell(ws, data['value'], border=border, number_format=_FMT_RUPEE),
+                self._cell(ws, conf, fill=conf_fill, border=border, number_format='0%'),
+                self._cell(ws, conf_label, border=border),
+            ])
     
     def _create_simple_company_sheet(self, company: str, results: List[Dict]):
         """Create a simple, readable sheet with all financial data for a company"""
-        sheet_name = f"{company[:25]}_Data"
-        try:
-            ws = self.workbook.create_sheet(sheet_name)
-        except:
-            # Sheet name might already exist, add suffix
-            ws = self.workbook.create_sheet(f"{sheet_name}_{len(self.workbook.sheetnames)}")
+        ws = self._create_sheet(f"{company[:25]}_Data")
         
-        # Title
-        ws['A1'] = f"{company} - Financial Data"
-        ws['A1'].font = Font(size=14, bold=True, color="FFFFFF")
-        ws['A1'].fill = PatternFill(start_color="667eea", end_color="667eea", fill_type="solid")
-        ws.merge_cells('A1:F1')
-        ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
-        ws.row_dimensions[1].height = 25
+        # Sort results by quarter
+        sorted_results = _sorted_by_key(results, _period_sort_key)
         
-        # Headers
-        ws['A3'] = "Metric"
-        ws['A3'].font = Font(bold=True)
+        # Auto-adjust columns
+        ws.column_dimensions['A'].width = 20
+        for col_idx in range(2, 2 + len(sorted_results)):
+            ws.column_dimensions[get_column_letter(col_idx)].width = 15
+        ws.row_dimensions[1].height = 25
         
-        # Sort results by quarter
-        sorted_results = sorted(results, key=lambda x: (x.get('year', 0), x.get('quarter', 'Q1')))
+        # Title
+        ws.append([self._cell(ws, f"{company} - Financial Data", font=_FONT_TITLE,
+                              fill=_FILL_TITLE, alignment=_ALIGN_TITLE)])
+        self._merge(ws, 'A1:F1')
+        ws.append([])
         
-        col_idx = 2
-        quarter_cols = {}
+        # Headers
+        header_cells = [self._cell(ws, "Metric", font=_FONT_BOLD)]
         for result in sorted_results:
             q_label = f"{result.get('quarter', 'Q?')} {result.get('year', '?')}"
-            ws.cell(row=3, column=col_idx, value=q_label)
-            ws.cell(row=3, column=col_idx).font = Font(bold=True)
-            ws.cell(row=3, column=col_idx).alignment = Alignment(horizontal='center')
-            quarter_cols[result.get('quarter')] = col_idx
-            col_idx += 1
-        
-        # Metrics to display
-        metrics_display = [
-            ('Revenue', 'total_income', False),
-            ('Op. EBITDA%', 'ebitda_margin', True),
-            ('Op. EBIT%', 'ebit_margin', True),
-            ('Op. PBT', 'op_pbt', False),
-            ('PBT', 'pbt', False),
-            ('PAT', 'pat', False),
-            ('EBITDA', 'ebitda', False),
-            ('EBIT', 'ebit', False),
-            ('Interest', 'interest', False),
-            ('Other Income', 'other_income', False),
-        ]
-        
-        row = 4
-        for label, key, is_percent in metrics_display:
-            ws.cell(row=row, column=1, value=label)
-            ws.cell(row=row, column=1).font = Font(bold=True)
+            header_cells.append(self._cell(ws, q_label, font=_FONT_BOLD, alignment=_ALIGN_CENTER))
+        ws.append(header_cells)
+        
+        # Build the metric x quarter grid in one pass over the results, then emit
+        # one appended row per metric
+        grid = [self._simple_sheet_values(result.get('extracted_data', {}))
+                for result in sorted_results]
+        
+        for m_idx, (label, _, is_percent) in enumerate(_SIMPLE_METRICS):
+            row_cells = [self._cell(ws, label, font=_FONT_BOLD)]
             
-            col_idx = 2
-            for result in sorted_results:
-                data = result.get('extracted_data', {})
-                value = None
-                
-                # Get or calculate value
-                if key in data:
-                    value = data[key].get('value')
-                elif key == 'op_pbt' and 'ebit' in data and 'interest' in data:
-                    # Calculate Op. PBT
-                    try:
-                        value = data['ebit']['value'] - data['interest']['value']
-                    except:
-                        pass
-                elif key == 'ebitda_margin' and 'ebitda' in data and 'total_income' in data:
-                    # Calculate EBITDA margin
-                    try:
-                        value = (data['ebitda']['value'] / data['total_income']['value']) * 100
-                    except:
-                        pass
-                elif key == 'ebit_margin' and 'ebit' in data and 'total_income' in data:
-                    # Calculate EBIT margin
-                    try:
-                        value = (data['ebit']['value'] / data['total_income']['value']) * 100
-                    except:
-                        pass
-                
+            for values in grid:
+                value = values[m_idx]
                 if value is not None:
                     if is_percent:
-                        ws.cell(row=row, column=col_idx, value=f"{value:.2f}%")
+                        # Source margins are in percent units; Excel percent formats expect fractions
+                        row_cells.append(self._cell(ws, value / 100, alignment=_ALIGN_RIGHT,
+                                                    number_format='0.00%'))
                     else:
-                        ws.cell(row=row, column=col_idx, value=value)
-                        ws.cell(row=row, column=col_idx).number_format = '#,##0.00'
+                        row_cells.append(self._cell(ws, value, alignment=_ALIGN_RIGHT,
+                                                    number_format='#,##0.00'))
                 else:
-                    ws.cell(row=row, column=col_idx, value='--')
-                
-                ws.cell(row=row, column=col_idx).alignment = Alignment(horizontal='right')
-                col_idx += 1
+                    row_cells.append(self._cell(ws, '--', alignment=_ALIGN_RIGHT))
             
-            row += 1
-        
-        # Auto-adjust columns
-        ws.column_dimensions['A'].width = 20
-        for col_idx in range(2, 2 + len(sorted_results)):
-            ws.column_dimensions[get_column_letter(col_idx)].width = 15
+            ws.append(row_cells)
         
         logger.info(f"Created simple data sheet '{ws.title}' for {company}")
     
-    def save_workbook(self, filepath: Path) -> bool:
+    @staticmethod
+    def _simple_sheet_values(data: Dict) -> Tuple[Optional[float], ...]:
+        """
+        Resolve every _SIMPLE_METRICS value for one quarter, deriving missing ones
+        
+        Args:
+            data: extracted_data dict for the quarter
+            
+        Returns:
+            Values aligned with _SIMPLE_METRICS (None where unavailable)
+        """
+        vals = _metric_values(data)
+        
+        # Derived metrics, only where the extractor did not supply them
+        for key in _DERIVED_KEYS:
+            if vals[key] is None:
+                vals[key] = _derive_metric(key, vals)
+        
+        return tuple(vals[key] for _, key, _ in _SIMPLE_METRICS)
+    
+    def save_workbook(self, filepath: Path, workbook: Optional[Workbook] = None) -> bool:
         """
         Save workbook to file
         
         Args:
             filepath: Path to save file
+            workbook: Workbook to save (defaults to the last one created)
             
         Returns:
             True if successful
         """
+        workbook = workbook or self.workbook
         try:
             filepath.parent.mkdir(parents=True, exist_ok=True)
-            self.workbook.save(filepath)
+            _write_xlsx(workbook, filepath)
             logger.info(f"Saved workbook to {filepath}")
             return True
         except Exception as e:
             logger.error(f"Error saving workbook: {e}")
             return False
     
-    def generate_excel(self, research_results: List[Dict], output_path: Path, template_path: Optional[str] = None) -> bool:
+    def generate_excel(self, research_results: List[Dict], output_path: Path, template_path: Optional[str] = None,
+                       backend: str = 'openpyxl') -> bool:
         """
         Generate and save Excel file in one step
         
@@ -624,13 +813,194 @@ class ExcelGenerator:
             research_results: List of research results
             output_path: Path to save file
             template_path: Optional path to template
+            backend: 'openpyxl' or 'xlsxwriter' (streams in constant_memory mode;
+                templates always use openpyxl since xlsxwriter cannot edit files)
             
         Returns:
             True if successful
         """
+        if backend == 'xlsxwriter' and not (template_path and Path(template_path).exists()):
+            if xlsxwriter is not None:
+                return self._generate_with_xlsxwriter(research_results, output_path)
+            logger.warning("xlsxwriter is not installed, falling back to openpyxl")
+        
         try:
             self.create_workbook(research_results, template_path)
-            return self.save_workbook(output_path)
+            saved = self.save_workbook(output_path)
         except Exception as e:
             logger.error(f"Error generating Excel: {e}")
             return False
+        
+        if saved and FAST_DASHBOARD_XLSX:
+            self._write_fast_dashboard(research_results, output_path)
+        return saved
+    
+    def generate_excel_async(self, research_results: List[Dict], output_path: Path,
+                             template_path: Optional[str] = None,
+                             executor: Optional[ThreadPoolExecutor] = None) -> Future:
+        """
+        Build the workbook now and save it in the background
+        
+        Serialization and compression dominate for large workbooks, so the
+        caller can carry on while the file is written.
+        
+        Args:
+            research_results: List of research results
+            output_path: Path to save file
+            template_path: Optional path to template
+            executor: Executor to save on (defaults to a shared single worker)
+            
+        Returns:
+            Future resolving to True if the file was saved
+        """
+        try:
+            workbook = self.create_workbook(research_results, template_path)
+        except Exception as e:
+            logger.error(f"Error generating Excel: {e}")
+            future = Future()
+            future.set_result(False)
+            return future
+        
+        # Bind this workbook explicitly - a later create_workbook call replaces self.workbook
+        return (executor or _get_save_executor()).submit(self.save_workbook, output_path, workbook)
+    
+    def _generate_with_xlsxwriter(self, research_results: List[Dict], output_path: Path) -> bool:
+        """
+        Write summary, dashboard and company data sheets with xlsxwriter
+        
+        Same layout and styling as the openpyxl path; rows go straight to XML
+        in constant_memory mode, so they are written strictly top to bottom.
+        
+        Args:
+            research_results: List of research results
+            output_path: Path to save file
+            
+        Returns:
+            True if successful
+        """
+        try:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            pre_rows = self._preprocess_results(research_results)
+            wb = xlsxwriter.Workbook(str(output_path), {'constant_memory': True, 'strings_to_numbers': False})
+            
+            def add_format(**attrs):
+                return wb.add_format(_xlsxwriter_props(**attrs))
+            
+            dash = {name: add_format(**attrs) for name, attrs in _DASHBOARD_STYLES.items()}
+            conf_fmts = {label: add_format(fill=fill, number_format='0.0%') for _, fill, label in _CONFIDENCE_BANDS}
+            status_ok = add_format(fill=_FILL_CONF_HI)
+            bold = add_format(font=_FONT_BOLD)
+            bold_center = add_format(font=_FONT_BOLD, alignment=_ALIGN_CENTER)
+            right = add_format(alignment=_ALIGN_RIGHT)
+            num_right = add_format(alignment=_ALIGN_RIGHT, number_format='#,##0.00')
+            pct_right = add_format(alignment=_ALIGN_RIGHT, number_format='0.00%')
+            
+            # Summary
+            ws = wb.add_worksheet("Summary")
+            ws.set_column(0, 5, 18)
+            ws.set_row(0, 30)
+            ws.merge_range(0, 0, 0, 5, "Financial Research Summary",
+                           add_format(font=_FONT_TITLE_SUMMARY, fill=_FILL_TITLE, alignment=_ALIGN_TITLE))
+            ws.write_row(2, 0, _SUMMARY_HEADERS, add_format(font=_FONT_HDR, fill=_FILL_HDR, alignment=_ALIGN_CENTER))
+            for r, row in enumerate(pre_rows, 3):
+                _, conf_label = _confidence_band(row.avg_conf)
+                ws.write_row(r, 0, (row.company, row.quarter, row.year, row.n_indicators))
+                ws.write_number(r, 4, row.avg_conf, conf_fmts[conf_label])
+                ws.write(r, 5, row.status, status_ok if row.status == 'success' else None)
+            
+            # Consolidated Dashboard
+            ws = wb.add_worksheet("Consolidated Dashboard")
+            ws.set_row(0, 35)
+            for col, (_, width, _) in enumerate(_DASHBOARD_COLUMNS):
+                ws.set_column(col, col, width)
+            ws.merge_range(0, 0, 0, len(_DASHBOARD_COLUMNS) - 1, "Consolidated Financial Dashboard",
+                           add_format(font=_FONT_TITLE_DASH, fill=_FILL_TITLE_DASH, alignment=_ALIGN_TITLE))
+            ws.write_row(2, 0, [header for header, _, _ in _DASHBOARD_COLUMNS], dash['dash_header'])
+            for r, row in enumerate(sorted(pre_rows, key=attrgetter('sort_key')), 3):
+                ws.write(r, 0, row.company, dash['dash_text'])
+                ws.write(r, 1, row.quarter, dash['dash_center'])
+                ws.write(r, 2, row.year, dash['dash_center'])
+                for c, (value, style) in enumerate(zip(row.dashboard_metrics(), _DASHBOARD_METRIC_STYLES), 3):
+                    if value:
+                        ws.write_number(r, c, value, dash[style])
+                    else:
+                        ws.write_string(r, c, '--', dash['dash_center'])
+                ws.write_string(r, 11, row.status.upper(),
+                                dash['dash_ok' if row.status == 'success' else 'dash_bad'])
+            
+            # Company data sheets
+            title_fmt = add_format(font=_FONT_TITLE, fill=_FILL_TITLE, alignment=_ALIGN_TITLE)
+            used_names = {"Summary", "Consolidated Dashboard"}
+            for company, company_results in self._group_by_company(research_results).items():
+                base_name = sheet_name = f"{company[:25]}_Data"
+                suffix = 1
+                while sheet_name in used_names:
+                    sheet_name = f"{base_name}_{suffix}"
+                    suffix += 1
+                used_names.add(sheet_name)
+                
+                sorted_results = _sorted_by_key(company_results, _period_sort_key)
+                grid = [self._simple_sheet_values(result.get('extracted_data', {})) for result in sorted_results]
+                
+                ws = wb.add_worksheet(sheet_name)
+                ws.set_column(0, 0, 20)
+                if sorted_results:
+                    ws.set_column(1, len(sorted_results), 15)
+                ws.set_row(0, 25)
+                ws.merge_range(0, 0, 0, 5, f"{company} - Financial Data", title_fmt)
+                ws.write(2, 0, "Metric", bold)
+                ws.write_row(2, 1, [f"{result.get('quarter', 'Q?')} {result.get('year', '?')}"
+                                    for result in sorted_results], bold_center)
+                for m_idx, (label, _, is_percent) in enumerate(_SIMPLE_METRICS):
+                    r = 3 + m_idx
+                    ws.write(r, 0, label, bold)
+                    for c, values in enumerate(grid, 1):
+                        value = values[m_idx]
+                        if value is None:
+                            ws.write_string(r, c, '--', right)
+                        elif is_percent:
+                            ws.write_number(r, c, value / 100, pct_right)
+                        else:
+                            ws.write_number(r, c, value, num_right)
+            
+            wb.close()
+            logger.info(f"Saved workbook to {output_path} (xlsxwriter, {len(used_names)} sheets)")
+            return True
+        except Exception as e:
+            logger.error(f"Error generating Excel with xlsxwriter: {e}")
+            return False
+    
+    def _write_fast_dashboard(self, research_results: List[Dict], output_path: Path) -> Optional[Path]:
+        """
+        Emit the dashboard table as a plain sibling <name>_dashboard.xlsx via py-excel-rs
+        
+        Unstyled, for batch runs that only need the numbers. Skipped (with a
+        warning) when py-excel-rs is not installed.
+        
+        Args:
+            research_results: List of research results
+            output_path: Path of the main workbook
+            
+        Returns:
+            Path of the dashboard file, or None if it was not written
+        """
+        if csv_to_xlsx is None:
+            logger.warning("FIN_FAST_XLSX is set but py-excel-rs is not installed, skipping fast dashboard")
+            return None
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([header for header, _, _ in _DASHBOARD_COLUMNS])
+        for row in sorted(self._preprocess_results(research_results), key=attrgetter('sort_key')):
+            writer.writerow([row.company, row.quarter, row.year,
+                             *('' if value is None else value for value in row.dashboard_metrics()),
+                             row.status.upper()])
+        
+        dashboard_path = output_path.with_name(f"{output_path.stem}_dashboard.xlsx")
+        try:
+            dashboard_path.write_bytes(csv_to_xlsx(buffer.getvalue().encode('utf-8')))
+            logger.info(f"Saved fast dashboard to {dashboard_path}")
+            return dashboard_path
+        except Exception as e:
+            logger.error(f"Error writing fast dashboard: {e}")
+            return None
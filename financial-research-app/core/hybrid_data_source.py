@@ -2,14 +2,47 @@
 # Primary: Perplexity AI (comprehensive multi-source research)
 # Secondary: Moneycontrol (fallback direct source for Indian companies)
 
-from typing import Dict, Optional, List
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, List, Tuple
 from core.perplexity_client import PerplexityClient
 from core.data_extractor import FinancialDataExtractor
 from parsers.moneycontrol_scraper_v2 import MoneycontrolScraperV2
+from core.summary import format_extraction
 from config.logging_config import get_logger
+from config.settings import NLP_PROCESS_WORKERS
+from utils.fan_out import gather_companies, run_companies
 
 logger = get_logger('hybrid_data_source')
 
+_nlp_executor: Optional[Executor] = None
+_nlp_executor_lock = threading.Lock()
+# Per-process extractor for ProcessPoolExecutor workers
+_worker_extractor: Optional[FinancialDataExtractor] = None
+
+
+def _get_nlp_executor() -> Executor:
+    """Shared executor that parses Perplexity answers while the next request is on the wire"""
+    global _nlp_executor
+    with _nlp_executor_lock:
+        if _nlp_executor is None:
+            if NLP_PROCESS_WORKERS > 0:
+                _nlp_executor = ProcessPoolExecutor(max_workers=NLP_PROCESS_WORKERS)
+            else:
+                _nlp_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='nlp')
+        return _nlp_executor
+
+
+def _extract_in_worker(raw_text: str, company: str, quarter: str, year: int) -> Dict:
+    """extract_with_context in a pool process, reusing one extractor per process"""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = FinancialDataExtractor()
+    return _worker_extractor.extract_with_context(raw_text, company, quarter, year)
+
+
 class HybridDataSource:
     """
     Hybrid data source that prioritizes comprehensive data:
@@ -17,6 +50,17 @@ class HybridDataSource:
     2. Secondary: Moneycontrol (fallback direct source for Indian companies)
     """
     
+    # Core indicators a Perplexity answer should cover before Moneycontrol is skipped
+    REQUIRED_INDICATORS = frozenset({'total_income', 'ebitda', 'ebit', 'pbt', 'pat'})
+    
+    # Circuit breaker: after this many consecutive Perplexity failures, go
+    # Moneycontrol-only for the cool-off period before probing again
+    BREAKER_THRESHOLD = 3
+    BREAKER_COOLDOWN_SECONDS = 120
+    
+    # One Moneycontrol page covers every recent quarter; reuse it across quarters this long
+    SCRAPE_TTL_SECONDS = 300
+    
     def __init__(self, perplexity_client: Optional[PerplexityClient] = None):
         """
         Initialize hybrid data source
@@ -26,7 +70,25 @@ class HybridDataSource:
         """
         self.perplexity_client = perplexity_client
         self.nlp_extractor = FinancialDataExtractor()
-        self.moneycontrol_scraper = MoneycontrolScraperV2()
+        # Built on first use - Perplexity-only runs never need it
+        self._moneycontrol_scraper = None
+        self._scraper_lock = threading.Lock()
+        self._failure_count = 0
+        self._open_until = 0.0
+        self._breaker_lock = threading.Lock()
+        # company -> (scraped_at, scrape_company() output)
+        self._scraped: Dict[str, Tuple[float, Dict]] = {}
+        self._scraped_lock = threading.Lock()
+    
+    @property
+    def moneycontrol_scraper(self) -> MoneycontrolScraperV2:
+        """Moneycontrol scraper (v2), constructed on first access"""
+        if self._moneycontrol_scraper is None:
+            with self._scraper_lock:
+                if self._moneycontrol_scraper is None:
+                    cache_manager = self.perplexity_client.cache_manager if self.perplexity_client else None
+                    self._moneycontrol_scraper = MoneycontrolScraperV2(cache_manager=cache_manager)
+        return self._moneycontrol_scraper
     
     def extract_financial_data(self, company: str, quarter: str, year: int) -> Dict:
         """
@@ -43,12 +105,13 @@ class HybridDataSource:
         logger.info(f"Extracting {company} {quarter} {year} - Perplexity Primary")
         
         # Try Perplexity first (comprehensive multi-source research)
-        if self.perplexity_client:
+        if self._perplexity_available():
             perplexity_result = self._extract_from_perplexity(company, quarter, year)
+            self._record_perplexity_outcome(perplexity_result is not None)
             
             if perplexity_result and perplexity_result.get('extracted_data'):
                 logger.info(f"[OK] Got data from Perplexity for {company} {quarter}")
-                return perplexity_result
+                return self._fill_missing_indicators(perplexity_result)
         
         # Fallback to Moneycontrol if Perplexity fails
         logger.info(f"Perplexity data incomplete, trying Moneycontrol fallback...")
@@ -75,6 +138,29 @@ class HybridDataSource:
             'error': 'No data available from any source'
         }
     
+    def _perplexity_available(self) -> bool:
+        """True if a Perplexity client is configured and the circuit breaker is closed"""
+        if not self.perplexity_client:
+            return False
+        if time.time() < self._open_until:
+            logger.debug("Perplexity circuit open, skipping to Moneycontrol")
+            return False
+        return True
+    
+    def _record_perplexity_outcome(self, ok: bool):
+        """Reset the failure count on success; open the circuit after repeated failures"""
+        with self._breaker_lock:
+            if ok:
+                self._failure_count = 0
+                return
+            
+            self._failure_count += 1
+            if self._failure_count >= self.BREAKER_THRESHOLD:
+                self._open_until = time.time() + self.BREAKER_COOLDOWN_SECONDS
+                self._failure_count = 0
+                logger.warning(f"Perplexity failed {self.BREAKER_THRESHOLD} times in a row, "
+                               f"using Moneycontrol only for {self.BREAKER_COOLDOWN_SECONDS}s")
+    
     def _extract_from_perplexity(self, company: str, quarter: str, year: int) -> Optional[Dict]:
         """
         Extract financial data from Perplexity AI
@@ -97,25 +183,124 @@ class HybridDataSource:
                 logger.warning(f"Perplexity returned no data for {company}")
                 return None
             
-            raw_text = result.get('raw_response', '')
-            
-            # Extract indicators using NLP
-            extracted = self.nlp_extractor.extract_with_context(raw_text, company, quarter, year)
-            
-            return {
-                'company': company,
-                'quarter': quarter,
-                'year': year,
-                'source': 'Perplexity AI',
-                'extracted_data': extracted['extracted_data'],
-                'context_confidence': extracted['context_confidence'],
-                'raw_response': raw_text
-            }
+            return self._perplexity_result(result, company, quarter, year)
             
         except Exception as e:
             logger.error(f"Perplexity extraction failed: {e}")
             return None
     
+    def _perplexity_result(self, result: Dict, company: str, quarter: str, year: int) -> Dict:
+        """Run NLP extraction over a Perplexity answer and build the standard result dict"""
+        raw_text = result.get('raw_response', '')
+        
+        # Extract indicators using NLP
+        extracted = self.nlp_extractor.extract_with_context(raw_text, company, quarter, year)
+        
+        return self._build_perplexity_result(extracted, raw_text, company, quarter, year)
+    
+    def _submit_nlp(self, raw_text: str, company: str, quarter: str, year: int) -> Future:
+        """Start extract_with_context on the shared NLP executor"""
+        if NLP_PROCESS_WORKERS > 0:
+            return _get_nlp_executor().submit(_extract_in_worker, raw_text, company, quarter, year)
+        return _get_nlp_executor().submit(self.nlp_extractor.extract_with_context,
+                                          raw_text, company, quarter, year)
+    
+    def _build_perplexity_result(self, extracted: Dict, raw_text: str, company: str,
+                                 quarter: str, year: int) -> Dict:
+        """Standard result dict for an NLP-parsed Perplexity answer"""
+        return {
+            'company': company,
+            'quarter': quarter,
+            'year': year,
+            'source': 'Perplexity AI',
+            'extracted_data': extracted['extracted_data'],
+            'context_confidence': extracted['context_confidence'],
+            'raw_response': raw_text
+        }
+    
+    def _fill_missing_indicators(self, perplexity_result: Dict) -> Dict:
+        """
+        Fill core indicators missing from a partial Perplexity result with Moneycontrol values
+        
+        Moneycontrol is only scraped when something is missing; Perplexity values are never overwritten.
+        
+        Args:
+            perplexity_result: Non-empty result from _perplexity_result
+            
+        Returns:
+            The same result, with any Moneycontrol values merged into extracted_data
+        """
+        extracted_data = perplexity_result['extracted_data']
+        missing = self.REQUIRED_INDICATORS - extracted_data.keys()
+        if not missing:
+            return perplexity_result
+        
+        company = perplexity_result['company']
+        quarter = perplexity_result['quarter']
+        logger.info(f"Perplexity missing {', '.join(sorted(missing))} for {company} {quarter}, "
+                    f"checking Moneycontrol")
+        moneycontrol_result = self._extract_from_moneycontrol(company, quarter, perplexity_result['year'])
+        if not moneycontrol_result:
+            return perplexity_result
+        
+        filled = {k: v for k, v in moneycontrol_result['extracted_data'].items() if k in missing}
+        if filled:
+            extracted_data.update(filled)
+            perplexity_result['supplemented_indicators'] = sorted(filled)
+            perplexity_result['source'] = 'Perplexity AI + Moneycontrol'
+        
+        return perplexity_result
+    
+    def extract_company_quarters(self, company: str, quarters: List[str], year: int) -> Dict[str, Dict]:
+        """
+        Extract several quarters of one company, asking Perplexity for all of them in one query
+        
+        Quarters the batched answer does not cover go through extract_financial_data
+        (per-quarter Perplexity query, then Moneycontrol fallback). The batched answers
+        are parsed on the NLP executor while those follow-up requests run.
+        
+        Args:
+            company: Company name
+            quarters: List of quarters
+            year: Financial year
+            
+        Returns:
+            Dictionary mapping quarter to extracted data
+        """
+        results = {}
+        parsing = {}
+        
+        if self._perplexity_available():
+            try:
+                batch = self.perplexity_client.get_company_financials_batch(company, quarters, year)
+                self._record_perplexity_outcome(bool(batch))
+                for quarter, result in batch.items():
+                    raw_text = result.get('raw_response', '')
+                    parsing[quarter] = (raw_text, self._submit_nlp(raw_text, company, quarter, year))
+            except Exception as e:
+                logger.error(f"Batched Perplexity extraction failed for {company}: {e}")
+                self._record_perplexity_outcome(False)
+        
+        # Quarters missing from the batched answer: query them while the rest is parsed
+        for quarter in quarters:
+            if quarter not in parsing:
+                results[quarter] = self.extract_financial_data(company, quarter, year)
+        
+        for quarter, (raw_text, future) in parsing.items():
+            try:
+                extracted = future.result()
+            except Exception as e:
+                logger.error(f"NLP extraction failed for {company} {quarter}: {e}")
+                extracted = None
+            
+            if extracted and extracted.get('extracted_data'):
+                perplexity_result = self._build_perplexity_result(extracted, raw_text, company, quarter, year)
+                results[quarter] = self._fill_missing_indicators(perplexity_result)
+            else:
+                results[quarter] = self.extract_financial_data(company, quarter, year)
+        
+        return {quarter: results[quarter] for quarter in quarters}
+    
     def _extract_from_moneycontrol(self, company: str, quarter: str, year: int) -> Optional[Dict]:
         """
         Extract financial data from Moneycontrol
@@ -131,8 +316,9 @@ class HybridDataSource:
         try:
             logger.debug(f"Scraping Moneycontrol for {company} {quarter} {year}")
             
-            # Scrape Moneycontrol
-            quarterly_data = self.moneycontrol_scraper.extract_specific_quarter(company, quarter, year)
+            # Scrape Moneycontrol - the whole table once per company, then slice
+            quarterly_data = self.moneycontrol_scraper.select_quarter(self._scrape_company(company),
+                                                                      quarter, year)
             
             if not quarterly_data:
                 logger.warning(f"Moneycontrol returned no data for {company}")
@@ -151,64 +337,74 @@ class HybridDataSource:
             logger.error(f"Moneycontrol extraction failed: {e}")
             return None
     
-    def extract_multiple_companies(self, companies: List[str], quarters: List[str], year: int) -> Dict[str, Dict]:
+    def _scrape_company(self, company: str) -> Dict[str, Dict]:
+        """scrape_company() output for a company, fetched at most once per SCRAPE_TTL_SECONDS once non-empty"""
+        now = time.time()
+        with self._scraped_lock:
+            entry = self._scraped.get(company)
+            if entry and now - entry[0] < self.SCRAPE_TTL_SECONDS:
+                return entry[1]
+        
+        scraped = self.moneycontrol_scraper.scrape_company(company)
+        if scraped:
+            # Failed fetches come back empty; don't let one pin the fallback off
+            with self._scraped_lock:
+                self._scraped[company] = (now, scraped)
+        return scraped
+    
+    def extract_multiple_companies(self, companies: List[str], quarters: List[str], year: int,
+                                   max_workers: int = 8) -> Dict[str, Dict]:
         """
         Extract data for multiple companies
         
+        Companies run concurrently on a thread pool, each with one batched
+        Perplexity query for all its quarters; calls are still paced by the
+        client's rate limiter.
+        
         Args:
             companies: List of company names
             quarters: List of quarters
             year: Financial year
+            max_workers: Thread pool size
             
         Returns:
             Dictionary mapping company to quarterly data
         """
-        all_results = {}
+        logger.info(f"Processing {len(companies)} companies x {len(quarters)} quarters...")
+        return run_companies(self.extract_company_quarters, companies, quarters, year, max_workers)
+    
+    async def aextract_financial_data(self, company: str, quarter: str, year: int) -> Dict:
+        """Async variant of extract_financial_data() - runs on a worker thread"""
+        return await asyncio.to_thread(self.extract_financial_data, company, quarter, year)
+    
+    async def aextract_multiple_companies(self, companies: List[str], quarters: List[str], year: int,
+                                          max_concurrency: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        Extract data for multiple companies, all companies in flight together
         
-        for company in companies:
-            logger.info(f"Processing {company}...")
-            company_data = {}
-            
-            for quarter in quarters:
-                try:
-                    result = self.extract_financial_data(company, quarter, year)
-                    company_data[quarter] = result
-                except Exception as e:
-                    logger.error(f"Error extracting {company} {quarter}: {e}")
-                    company_data[quarter] = {
-                        'company': company,
-                        'quarter': quarter,
-                        'year': year,
-                        'error': str(e),
-                        'extracted_data': {}
-                    }
+        Args:
+            companies: List of company names
+            quarters: List of quarters
+            year: Financial year
+            max_concurrency: Cap on concurrent extractions (default: half the Perplexity RPM)
             
-            all_results[company] = company_data
-        
-        return all_results
+        Returns:
+            Dictionary mapping company to quarterly data
+        """
+        if max_concurrency is None:
+            max_concurrency = self._default_concurrency()
+        return await gather_companies(self.extract_company_quarters, companies, quarters,
+                                      year, max_concurrency)
+    
+    def _default_concurrency(self) -> int:
+        """Half the Perplexity rate limit, so bursts do not immediately hit the limiter"""
+        if self.perplexity_client:
+            return max(1, self.perplexity_client.rate_limiter.requests_per_minute // 2)
+        return 4
     
     def get_data_summary(self, result: Dict) -> str:
         """Generate summary of extraction result"""
-        summary_lines = []
-        summary_lines.append(f"Company: {result.get('company', 'N/A')}")
-        summary_lines.append(f"Period: {result.get('quarter', 'N/A')} {result.get('year', 'N/A')}")
-        summary_lines.append(f"Source: {result.get('source', 'Unknown')}")
-        summary_lines.append(f"Confidence: {result.get('context_confidence', 0):.2f}")
-        summary_lines.append("\nExtracted Indicators:")
-        
-        data = result.get('extracted_data', {})
-        if not data:
-            summary_lines.append("  No data extracted")
-        else:
-            for indicator, values in data.items():
-                if isinstance(values, dict) and 'value' in values:
-                    value = values['value']
-                    confidence = values.get('confidence', 0)
-                    summary_lines.append(f"  {indicator}: ₹{value:.2f} Cr (conf: {confidence:.2f})")
-                else:
-                    summary_lines.append(f"  {indicator}: {values}")
-        
-        return '\n'.join(summary_lines)
+        return format_extraction(result)
     
     def get_available_companies(self) -> List[str]:
         """Get list of available companies"""
@@ -1,11 +1,14 @@
 # Moneycontrol-based Financial Data Extractor
 # Direct extraction from Moneycontrol portal with fallback to Perplexity
 
+import threading
 from typing import Dict, Optional, List
 from parsers.moneycontrol_scraper import MoneycontrolScraper
 from core.perplexity_client import PerplexityClient
 from core.data_extractor import FinancialDataExtractor
+from core.summary import format_extraction
 from config.logging_config import get_logger
+from utils.fan_out import gather_companies, run_companies
 
 logger = get_logger('moneycontrol_extractor')
 
@@ -19,11 +22,23 @@ class MoneycontrolFinancialExtractor:
         Args:
             perplexity_client: Optional Perplexity client for fallback
         """
-        self.scraper = MoneycontrolScraper()
+        # Built on first use
+        self._scraper = None
+        self._scraper_lock = threading.Lock()
         self.perplexity_client = perplexity_client
         self.nlp_extractor = FinancialDataExtractor()
     
-    def extract_from_moneycontrol(self, company: str, quarter: str, year: int) -> Optional[Dict]:
+    @property
+    def scraper(self) -> MoneycontrolScraper:
+        """Moneycontrol scraper, constructed on first access"""
+        if self._scraper is None:
+            with self._scraper_lock:
+                if self._scraper is None:
+                    self._scraper = MoneycontrolScraper()
+        return self._scraper
+    
+    def extract_from_moneycontrol(self, company: str, quarter: str, year: int,
+                                  scraped: Optional[Dict[str, Dict]] = None) -> Optional[Dict]:
         """
         Extract financial data directly from Moneycontrol
         
@@ -31,6 +46,7 @@ class MoneycontrolFinancialExtractor:
             company: Company name
             quarter: Quarter (Q1, Q2, Q3, Q4)
             year: Financial year
+            scraped: Output of scraper.scrape_company(company) to slice instead of fetching again
             
         Returns:
             Dictionary of extracted financial data or None
@@ -38,8 +54,11 @@ class MoneycontrolFinancialExtractor:
         try:
             logger.info(f"Extracting from Moneycontrol: {company} {quarter} {year}")
             
-            # Scrape Moneycontrol
-            quarterly_data = self.scraper.extract_specific_quarter(company, quarter, year)
+            # Scrape Moneycontrol (or reuse the company's already scraped table)
+            if scraped is None:
+                quarterly_data = self.scraper.extract_specific_quarter(company, quarter, year)
+            else:
+                quarterly_data = self.scraper.select_quarter(scraped, quarter, year)
             
             if quarterly_data:
                 logger.info(f"Successfully extracted {len(quarterly_data)} indicators from Moneycontrol")
@@ -59,7 +78,8 @@ class MoneycontrolFinancialExtractor:
             logger.error(f"Error extracting from Moneycontrol: {e}")
             return None
     
-    def extract_with_fallback(self, company: str, quarter: str, year: int) -> Dict:
+    def extract_with_fallback(self, company: str, quarter: str, year: int,
+                              scraped: Optional[Dict[str, Dict]] = None) -> Dict:
         """
         Extract financial data with Moneycontrol primary and Perplexity fallback
         
@@ -67,12 +87,13 @@ class MoneycontrolFinancialExtractor:
             company: Company name
             quarter: Quarter (Q1, Q2, Q3, Q4)
             year: Financial year
+            scraped: Output of scraper.scrape_company(company), if already fetched
             
         Returns:
             Dictionary of extracted financial data
         """
         # Try Moneycontrol first
-        mc_result = self.extract_from_moneycontrol(company, quarter, year)
+        mc_result = self.extract_from_moneycontrol(company, quarter, year, scraped)
         
         if mc_result:
             return mc_result
@@ -114,6 +135,9 @@ class MoneycontrolFinancialExtractor:
         """
         Extract data for all quarters of a company
         
+        The Moneycontrol results page lists every recent quarter, so it is
+        fetched once and sliced per quarter.
+        
         Args:
             company: Company name
             quarters: List of quarters (Q1, Q2, Q3, Q4)
@@ -124,9 +148,15 @@ class MoneycontrolFinancialExtractor:
         """
         results = {}
         
+        try:
+            scraped = self.scraper.scrape_company(company)
+        except Exception as e:
+            logger.error(f"Error scraping Moneycontrol for {company}: {e}")
+            scraped = {}
+        
         for quarter in quarters:
             try:
-                result = self.extract_with_fallback(company, quarter, year)
+                result = self.extract_with_fallback(company, quarter, year, scraped)
                 results[quarter] = result
             except Exception as e:
                 logger.error(f"Error extracting {company} {quarter}: {e}")
@@ -140,48 +170,40 @@ class MoneycontrolFinancialExtractor:
         
         return results
     
-    def extract_multiple_companies(self, companies: List[str], quarters: List[str], year: int) -> Dict[str, Dict]:
+    def extract_multiple_companies(self, companies: List[str], quarters: List[str], year: int,
+                                   max_workers: int = 8) -> Dict[str, Dict]:
         """
-        Extract data for multiple companies
+        Extract data for multiple companies on a thread pool, one Moneycontrol fetch per company
         
         Args:
             companies: List of company names
             quarters: List of quarters
             year: Financial year
+            max_workers: Thread pool size
             
         Returns:
             Dictionary mapping company to quarterly data
         """
-        all_results = {}
-        
-        for company in companies:
-            try:
-                logger.info(f"Processing {company}...")
-                company_data = self.extract_all_quarters(company, quarters, year)
-                all_results[company] = company_data
-            except Exception as e:
-                logger.error(f"Error processing {company}: {e}")
-                all_results[company] = {'error': str(e)}
+        logger.info(f"Processing {len(companies)} companies x {len(quarters)} quarters...")
+        return run_companies(self.extract_all_quarters, companies, quarters, year, max_workers)
+    
+    async def aextract_multiple_companies(self, companies: List[str], quarters: List[str], year: int,
+                                          max_concurrency: int = 4) -> Dict[str, Dict]:
+        """
+        Extract data for multiple companies with all companies in flight together
         
-        return all_results
+        Args:
+            companies: List of company names
+            quarters: List of quarters
+            year: Financial year
+            max_concurrency: Cap on concurrent extractions
+            
+        Returns:
+            Dictionary mapping company to quarterly data
+        """
+        return await gather_companies(self.extract_all_quarters, companies, quarters,
+                                      year, max_concurrency)
     
     def get_extraction_summary(self, extracted_data: Dict) -> str:
         """Generate human-readable summary of extraction"""
-        summary_lines = []
-        summary_lines.append(f"Company: {extracted_data.get('company', 'N/A')}")
-        summary_lines.append(f"Period: {extracted_data.get('quarter', 'N/A')} {extracted_data.get('year', 'N/A')}")
-        summary_lines.append(f"Source: {extracted_data.get('source', 'Unknown')}")
-        summary_lines.append(f"Confidence: {extracted_data.get('context_confidence', 0):.2f}")
-        summary_lines.append("\nExtracted Indicators:")
-        
-        data = extracted_data.get('extracted_data', {})
-        if not data:
-            summary_lines.append("  No data extracted")
-        else:
-            for indicator, values in data.items():
-                if isinstance(values, dict) and 'value' in values:
-                    summary_lines.append(f"  {indicator}: ₹{values['value']:.2f} Cr (conf: {values.get('confidence', 0):.2f})")
-                else:
-                    summary_lines.append(f"  {indicator}: {values}")
-        
-        return '\n'.join(summary_lines)
+        return format_extraction(extracted_data)
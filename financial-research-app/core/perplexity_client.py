@@ -1,39 +1,168 @@
 # Perplexity API Client
 # Complete API wrapper with rate limiting, retry logic, and caching
 
+import asyncio
+import hashlib
+import json
+import re
+import threading
 import time
 import requests
+from datetime import date
+from requests.adapters import HTTPAdapter
 from typing import Dict, Optional, List
-from collections import deque
+from collections import OrderedDict, deque
+from concurrent.futures import Future
 from config.logging_config import get_logger
 from core.cache_manager import CacheManager
 
+try:
+    import orjson  # optional, faster request encoding / response decoding
+except ImportError:
+    orjson = None
+
 logger = get_logger('perplexity')
 
+# bytes <-> dict codecs for the API body; json.loads accepts bytes as well
+if orjson is not None:
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+    _json_loads = json.loads
+
+# Simple pattern matching for numbers: one alternation scanned once with finditer
+# Format: "Revenue: 1,234.56" or "EBITDA: Rs. 500.00 Cr"
+# EBITDA is listed before EBIT so the longer label wins at the same position
+_FIN_ALL = re.compile(
+    r'(?P<indicator>Revenue|Total Income|EBITDA|EBIT|PBT|PAT).*?(?P<value>\d+(?:,\d+)*(?:\.\d+)?)',
+    re.IGNORECASE
+)
+_FIN_KEYS = {
+    'revenue': 'Revenue',
+    'total income': 'Revenue',
+    'ebitda': 'EBITDA',
+    'ebit': 'EBIT',
+    'pbt': 'PBT',
+    'pat': 'PAT',
+}
+_COMMA_STRIP = str.maketrans({',': None})
+
+# Non-200 statuses worth retrying (timeouts / gateway hiccups); others fail fast
+_TRANSIENT_STATUS = frozenset({408, 502, 503, 504})
+
+# Upper bound on a server-sent Retry-After, so one 429 cannot park a worker thread
+_MAX_RETRY_AFTER_SECONDS = 30.0
+
+# Default metrics for single-quarter queries, pre-joined into the prompt block
+_DEFAULT_INDICATORS = (
+    'Total Revenue/Total Income from Operations',
+    'EBITDA', 'EBIT', 'PBT', 'PAT',
+    'Employee Cost', 'Other Expenses',
+    'Depreciation', 'Interest', 'Other Income'
+)
+_DEFAULT_INDICATORS_BLOCK = '\n'.join('- ' + ind for ind in _DEFAULT_INDICATORS)
+
+_QUARTER_END_MONTH = {"Q1": "June", "Q2": "September", "Q3": "December", "Q4": "March"}
+
+# Metrics requested per quarter in batched queries: (JSON key, label understood by the NLP extractor)
+_BATCH_FIELDS = (
+    ('total_income', 'Total Income'),
+    ('ebitda', 'EBITDA'),
+    ('ebit', 'EBIT'),
+    ('pbt', 'PBT'),
+    ('pat', 'PAT'),
+    ('employee_cost', 'Employee Cost'),
+    ('other_expenses', 'Other Expenses'),
+    ('depreciation', 'Depreciation'),
+    ('interest', 'Interest'),
+    ('other_income', 'Other Income'),
+    ('eps', 'EPS'),
+)
+_BATCH_FIELDS_BLOCK = '\n'.join(f'- {key} ({label})' for key, label in _BATCH_FIELDS)
+
+# Cache lifetimes: results move around right after quarter-end while companies
+# announce, then stay put until the next quarter closes
+_EARNINGS_WINDOW_DAYS = 45
+_EARNINGS_CACHE_TTL = 6 * 3600
+_STABLE_CACHE_TTL = 30 * 86400
+
+
+def _cache_ttl(today: Optional[date] = None) -> int:
+    """TTL for a fresh response: short inside an earnings window, long otherwise"""
+    today = today or date.today()
+    # Most recent quarter end (Mar/Jun/Sep/Dec); month 1-3 rolls back to December
+    end_month = (today.month - 1) // 3 * 3
+    if end_month == 0:
+        quarter_end = date(today.year - 1, 12, 31)
+    else:
+        quarter_end = date(today.year, end_month, 30 if end_month in (6, 9) else 31)
+    
+    if (today - quarter_end).days <= _EARNINGS_WINDOW_DAYS:
+        return _EARNINGS_CACHE_TTL
+    return _STABLE_CACHE_TTL
+
+
+def _slim_response(result: Dict) -> Dict:
+    """
+    Keep only what callers read from a chat completion: the first answer and token usage
+    
+    Citations, search results and per-choice metadata are dropped before caching.
+    Unexpected shapes are returned untouched.
+    """
+    try:
+        content = result['choices'][0]['message']['content']
+    except (KeyError, IndexError, TypeError):
+        return result
+    return {
+        'model': result.get('model'),
+        'choices': [{'message': {'role': 'assistant', 'content': content}}],
+        'usage': result.get('usage')
+    }
+
+
 class RateLimiter:
     """Token bucket rate limiter"""
     
     def __init__(self, requests_per_minute: int):
         self.requests_per_minute = requests_per_minute
         self.requests = deque()
+        # Queries may run on worker threads; held only while inspecting the window
+        self._lock = threading.Lock()
         
-    def wait_if_needed(self):
-        """Wait if rate limit would be exceeded"""
-        now = time.time()
-        
-        # Remove requests older than 1 minute
+    def _trim(self, now: float):
+        """Drop requests older than 1 minute (caller holds the lock)"""
         while self.requests and now - self.requests[0] > 60:
             self.requests.popleft()
-        
-        # If at limit, wait
-        if len(self.requests) >= self.requests_per_minute:
+    
+    def reserve_slot(self) -> bool:
+        """Record a request if the window has room; returns False when at the limit"""
+        with self._lock:
+            now = time.time()
+            self._trim(now)
+            if len(self.requests) < self.requests_per_minute:
+                self.requests.append(now)
+                return True
+            return False
+    
+    def wait_for_slot(self):
+        """Sleep until the window has room, without reserving it"""
+        with self._lock:
+            now = time.time()
+            self._trim(now)
+            if len(self.requests) < self.requests_per_minute:
+                return
             sleep_time = 60 - (now - self.requests[0])
-            if sleep_time > 0:
-                logger.info(f"Rate limit reached, waiting {sleep_time:.2f}s")
-                time.sleep(sleep_time)
-                self.wait_if_needed()  # Recursive call after waiting
         
-        self.requests.append(now)
+        logger.info(f"Rate limit reached, waiting {sleep_time:.2f}s")
+        time.sleep(max(sleep_time, 0))
+    
+    def wait_if_needed(self):
+        """Wait if rate limit would be exceeded, then reserve a slot"""
+        # Another thread may take the freed slot first, so re-check after waking
+        while not self.reserve_slot():
+            self.wait_for_slot()
 
 
 class PerplexityClient:
@@ -60,6 +189,68 @@ class PerplexityClient:
         self.use_finance_domain = use_finance_domain
         self.model = model
         
+        # Per-query constants, built once: system message and search options
+        system_message = 'You are a financial data expert. Provide precise numerical data with sources from reliable financial databases and official filings.'
+        if use_finance_domain:
+            system_message += ' Focus on financial metrics, quarterly results, and company financials from sources like MoneyControl, Screener.in, BSE, NSE, and official company reports.'
+        self._system_message = {'role': 'system', 'content': system_message}
+        
+        # Force real-time search with recent data
+        self._payload_options = {'search_recency_filter': 'month'}
+        if use_finance_domain:
+            # Search domain hint - may not be supported by all plans
+            self._payload_options['search_domain_filter'] = ['finance']
+        
+        # In-process LRU in front of the persistent cache: blake2b(model, prompt) -> (expires_at, response)
+        self._mem_cache: OrderedDict = OrderedDict()
+        self._mem_cache_size = 256
+        self._mem_lock = threading.Lock()
+        
+        # Queries currently being sent, so identical concurrent calls share one request
+        self._inflight: Dict[bytes, Future] = {}
+        self._inflight_lock = threading.Lock()
+        
+        # Reuse TCP/TLS connections across queries (retries are handled in query())
+        self.session = requests.Session()
+        self._pool_maxsize = 0
+        self._pool_lock = threading.Lock()
+        self.configure_pool(8)
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        })
+    
+    def configure_pool(self, max_workers: int):
+        """
+        Size the connection pool for up to max_workers concurrent callers
+        
+        Only ever grows the pool; call before starting a thread pool so its
+        workers reuse connections instead of opening and discarding extras.
+        
+        Args:
+            max_workers: Number of threads that will share this client
+        """
+        pool_maxsize = max(16, max_workers * 2)
+        with self._pool_lock:
+            if pool_maxsize <= self._pool_maxsize:
+                return
+            # Release the outgrown pool's idle connections before replacing it
+            self.session.get_adapter('https://').close()
+            # max_retries=0: status-aware retries live in query()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+            self.session.mount('https://', adapter)
+            self._pool_maxsize = pool_maxsize
+        
+    def close(self):
+        """Release pooled HTTP connections"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        
     def _build_financial_query(self, company: str, quarter: str, year: int, 
                                indicators: Optional[List[str]] = None) -> str:
         """
@@ -75,25 +266,51 @@ class PerplexityClient:
             Formatted query string
         """
         if indicators is None:
-            indicators = [
-                'Total Revenue/Total Income from Operations',
-                'EBITDA', 'EBIT', 'PBT', 'PAT',
-                'Employee Cost', 'Other Expenses',
-                'Depreciation', 'Interest', 'Other Income'
-            ]
+            indicators_block = _DEFAULT_INDICATORS_BLOCK
+        else:
+            indicators_block = '\n'.join('- ' + ind for ind in indicators)
+        
+        query = f"""
+        Search for the quarterly financial data for {company} for {self._quarter_period(quarter, year)} from recent sources.
+        
+        Please provide the following metrics (in INR Crores):
+        {indicators_block}
         
+        Source: Use the most recent data from MoneyControl, Screener.in, BSE/NSE filings, or official company announcements.
+        Format: Please provide exact numerical values with units.
+        """
+        
+        return query.strip()
+    
+    def _quarter_period(self, quarter: str, year: int) -> str:
+        """Describe a quarter unambiguously, e.g. 'Q3 FY2024-25 (quarter ending December 2024)'"""
         # Clarify fiscal year - Q3 2025 means FY 2024-25 Q3 (Oct-Dec 2024, announced Jan 2025)
         fy_context = f"FY{year-1}-{str(year)[2:]}" if year >= 2025 else f"FY{year}"
-        quarter_end_month = {"Q1": "June", "Q2": "September", "Q3": "December", "Q4": "March"}
+        return (f"{quarter} {fy_context} (quarter ending {_QUARTER_END_MONTH.get(quarter, '')} "
+                f"{year-1 if quarter != 'Q4' else year})")
+    
+    def _build_batch_query(self, company: str, quarters: List[str], year: int) -> str:
+        """
+        Build one query covering several quarters, answered as JSON
         
+        Args:
+            company: Company name
+            quarters: Quarters to fetch
+            year: Financial year
+            
+        Returns:
+            Formatted query string
+        """
+        example = json.dumps({quarters[0]: {'total_income': 1234.5, 'ebitda': None}})
         query = f"""
-        Search for the quarterly financial data for {company} for {quarter} {fy_context} (quarter ending {quarter_end_month.get(quarter, '')} {year-1 if quarter != 'Q4' else year}) from recent sources.
+        Search for the quarterly financial data for {company} for each of these quarters from recent sources:
+        {chr(10).join('- ' + self._quarter_period(quarter, year) for quarter in quarters)}
         
-        Please provide the following metrics (in INR Crores):
-        {chr(10).join('- ' + ind for ind in indicators)}
+        For every quarter provide the following metrics (in INR Crores):
+        {_BATCH_FIELDS_BLOCK}
         
         Source: Use the most recent data from MoneyControl, Screener.in, BSE/NSE filings, or official company announcements.
-        Format: Please provide exact numerical values with units.
+        Format: Reply with only a JSON object keyed by quarter ({', '.join(quarters)}); each value maps the metric keys above to numbers, or null if not reported. Example: {example}
         """
         
         return query.strip()
@@ -114,78 +331,115 @@ class PerplexityClient:
         if model is None:
             model = self.model
             
-        # Check cache first
+        query_key = hashlib.blake2b(f"{model}\x00{prompt}".encode(), digest_size=16).digest()
+        
+        # Check cache first - memory tier, then persistent
         if self.cache_manager:
-            cache_key = {'prompt': prompt, 'model': model}
-            cached = self.cache_manager.get(cache_key)
+            cached = self._mem_cache_get(query_key)
             if cached:
+                logger.info("Returning cached response (memory)")
+                return cached
+            
+            cache_key = {'prompt': prompt, 'model': model}
+            entry = self.cache_manager.get_with_expiry(cache_key)
+            if entry and entry[0]:
+                cached, expires_at = entry
                 logger.info("Returning cached response")
+                # Promote with the disk entry's remaining lifetime, not a fresh TTL
+                self._mem_cache_put(query_key, cached, expires_at - time.time())
                 return cached
         
-        # Rate limiting
-        self.rate_limiter.wait_if_needed()
+        # Coalesce with an identical query already in flight on another thread
+        with self._inflight_lock:
+            inflight = self._inflight.get(query_key)
+            if inflight is None:
+                future = self._inflight[query_key] = Future()
         
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Content-Type': 'application/json'
-        }
+        if inflight is not None:
+            logger.info("Waiting for identical in-flight query")
+            return inflight.result()
         
-        # Build system message with finance domain if enabled
-        system_message = 'You are a financial data expert. Provide precise numerical data with sources from reliable financial databases and official filings.'
+        try:
+            result = self._send(prompt, model, max_retries, query_key)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(query_key, None)
+    
+    def _send(self, prompt: str, model: str, max_retries: int, query_key: bytes) -> Optional[Dict]:
+        """
+        Send one query to the API (rate limited, with retries) and cache a successful answer
         
-        if self.use_finance_domain:
-            system_message += ' Focus on financial metrics, quarterly results, and company financials from sources like MoneyControl, Screener.in, BSE, NSE, and official company reports.'
+        Args:
+            prompt: Query prompt
+            model: Model to use
+            max_retries: Maximum retry attempts
+            query_key: Digest of (model, prompt) used by the in-process cache
+            
+        Returns:
+            API response or None on failure
+        """
+        # Rate limiting
+        self.rate_limiter.wait_if_needed()
         
         payload = {
             'model': model,
-            'messages': [
-                {
-                    'role': 'system',
-                    'content': system_message
-                },
-                {
-                    'role': 'user',
-                    'content': prompt
-                }
-            ],
-            # Force real-time search with recent data
-            'search_recency_filter': 'month'
+            'messages': [self._system_message, {'role': 'user', 'content': prompt}],
+            **self._payload_options
         }
         
-        # Add search domain hint if finance domain is enabled
-        if self.use_finance_domain:
-            payload['search_domain_filter'] = ['finance']  # May not be supported by all plans
+        # Encode once; the session already sends Content-Type: application/json
+        body = _json_dumps(payload)
         
         for attempt in range(max_retries):
             try:
                 logger.info(f"Querying Perplexity API (attempt {attempt + 1}/{max_retries})")
-                response = requests.post(
+                response = self.session.post(
                     self.api_url,
-                    headers=headers,
-                    json=payload,
+                    data=body,
                     timeout=30
                 )
                 
                 if response.status_code == 200:
-                    result = response.json()
+                    result = _slim_response(_json_loads(response.content))
                     
                     # Cache successful response
                     if self.cache_manager:
-                        self.cache_manager.set(cache_key, result)
+                        ttl = _cache_ttl()
+                        self.cache_manager.set({'prompt': prompt, 'model': model}, result, ttl_seconds=ttl)
+                        self._mem_cache_put(query_key, result, ttl)
                     
                     logger.info("API query successful")
                     return result
                     
-                elif response.status_code == 429:  # Rate limit hit
-                    wait_time = 2 ** attempt  # Exponential backoff
-                    logger.warning(f"Rate limit hit, waiting {wait_time}s")
-                    time.sleep(wait_time)
+                
+                # Hand the connection back to the pool before deciding what to do
+                response.close()
+                
+                if response.status_code == 429:  # Rate limit hit
+                    # Back off only - the slot reserved above covers the retries too,
+                    # so the limiter does not count this query twice
+                    if attempt < max_retries - 1:
+                        wait_time = self._retry_after(response, attempt)
+                        logger.warning(f"Rate limit hit, waiting {wait_time}s")
+                        time.sleep(wait_time)
+                    else:
+                        logger.warning("Rate limit hit, giving up")
                     
-                else:
-                    logger.error(f"API error {response.status_code}: {response.text}")
+                elif response.status_code in _TRANSIENT_STATUS:
+                    logger.warning(f"API error {response.status_code}, retrying")
                     if attempt < max_retries - 1:
                         time.sleep(2 ** attempt)
                     
+                else:
+                    # Auth/request errors and other failures will not fix themselves
+                    logger.error(f"API error {response.status_code}: {response.text}")
+                    return None
+                    
             except Exception as e:
                 logger.error(f"Request failed: {e}")
                 if attempt < max_retries - 1:
@@ -193,6 +447,73 @@ class PerplexityClient:
         
         return None
     
+    def query_content(self, prompt: str, model: str = None, max_retries: int = 3) -> Optional[str]:
+        """
+        Query Perplexity and return just the answer text
+        
+        Args:
+            prompt: Query prompt
+            model: Model to use (uses instance default if None)
+            max_retries: Maximum retry attempts
+            
+        Returns:
+            Content of the first choice, or None on failure
+        """
+        response = self.query(prompt, model, max_retries)
+        if response and 'choices' in response:
+            return response['choices'][0]['message']['content']
+        return None
+    
+    @staticmethod
+    def _retry_after(response: requests.Response, attempt: int) -> float:
+        """Seconds to wait after a 429: the Retry-After header if numeric, else exponential
+        backoff - capped at _MAX_RETRY_AFTER_SECONDS"""
+        retry_after = response.headers.get('Retry-After', '')
+        try:
+            wait_time = max(float(retry_after), 0.0)
+        except ValueError:
+            wait_time = 2 ** attempt
+        return min(wait_time, _MAX_RETRY_AFTER_SECONDS)
+    
+    async def aquery(self, prompt: str, model: str = None, max_retries: int = 3) -> Optional[Dict]:
+        """
+        Async variant of query() - runs the blocking request on a worker thread
+        
+        Args:
+            prompt: Query prompt
+            model: Model to use (uses instance default if None)
+            max_retries: Maximum retry attempts
+            
+        Returns:
+            API response or None on failure
+        """
+        return await asyncio.to_thread(self.query, prompt, model, max_retries)
+    
+    async def aget_company_financials(self, company: str, quarter: str, year: int) -> Optional[Dict]:
+        """Async variant of get_company_financials()"""
+        return await asyncio.to_thread(self.get_company_financials, company, quarter, year)
+    
+    def _mem_cache_get(self, key: bytes) -> Optional[Dict]:
+        """Look up the in-process cache, marking the entry most recently used"""
+        with self._mem_lock:
+            entry = self._mem_cache.get(key)
+            if entry is None:
+                return None
+            expires_at, cached = entry
+            if time.time() > expires_at:
+                del self._mem_cache[key]
+                return None
+            self._mem_cache.move_to_end(key)
+            return cached
+    
+    def _mem_cache_put(self, key: bytes, response: Dict, ttl_seconds: float):
+        """Store a response in the in-process cache, evicting the least recently used"""
+        with self._mem_lock:
+            self._mem_cache[key] = (time.time() + ttl_seconds, response)
+            self._mem_cache.move_to_end(key)
+            while len(self._mem_cache) > self._mem_cache_size:
+                self._mem_cache.popitem(last=False)
+    
     def get_company_financials(self, company: str, quarter: str, year: int) -> Optional[Dict]:
         """
         Get comprehensive financial data for a company
@@ -205,11 +526,9 @@ class PerplexityClient:
         Returns:
             Financial data dictionary or None
         """
-        query = self._build_financial_query(company, quarter, year)
-        response = self.query(query)
+        content = self.query_content(self._build_financial_query(company, quarter, year))
         
-        if response and 'choices' in response:
-            content = response['choices'][0]['message']['content']
+        if content is not None:
             return {
                 'company': company,
                 'quarter': quarter,
@@ -220,6 +539,63 @@ class PerplexityClient:
         
         return None
     
+    def get_company_financials_batch(self, company: str, quarters: List[str], year: int) -> Dict[str, Dict]:
+        """
+        Get financial data for several quarters of a company with a single API call
+        
+        Args:
+            company: Company name
+            quarters: Quarters to fetch (Q1, Q2, Q3, Q4)
+            year: Financial year
+            
+        Returns:
+            Dictionary mapping quarter to the same shape get_company_financials returns;
+            quarters missing from the answer are left out
+        """
+        if not quarters:
+            return {}
+        
+        content = self.query_content(self._build_batch_query(company, quarters, year))
+        if content is None:
+            return {}
+        
+        by_quarter = self._parse_json_object(content)
+        timestamp = time.time()
+        results = {}
+        for quarter in quarters:
+            metrics = by_quarter.get(quarter)
+            if not isinstance(metrics, dict):
+                continue
+            
+            # Render as a markdown table so the NLP extractor handles it like any other answer
+            lines = [f"## {company} - {self._quarter_period(quarter, year)}", "", "| Metric | Value (INR Cr) |", "|---|---|"]
+            lines.extend(f"| {label} | {metrics[key]} |" for key, label in _BATCH_FIELDS
+                         if isinstance(metrics.get(key), (int, float)))
+            results[quarter] = {
+                'company': company,
+                'quarter': quarter,
+                'year': year,
+                'raw_response': '\n'.join(lines),
+                'timestamp': timestamp
+            }
+        
+        logger.info(f"Batched query returned {len(results)}/{len(quarters)} quarters for {company}")
+        return results
+    
+    @staticmethod
+    def _parse_json_object(content: str) -> Dict:
+        """Pull the JSON object out of a model reply (tolerates code fences and surrounding prose)"""
+        start, end = content.find('{'), content.rfind('}')
+        if start == -1 or end <= start:
+            logger.warning("No JSON object found in batched response")
+            return {}
+        try:
+            parsed = json.loads(content[start:end + 1])
+        except ValueError as e:
+            logger.warning(f"Could not parse batched response as JSON: {e}")
+            return {}
+        return parsed if isinstance(parsed, dict) else {}
+    
     def parse_financial_response(self, response: Dict) -> Dict[str, float]:
         """
         Parse financial data from API response
@@ -230,29 +606,14 @@ class PerplexityClient:
         Returns:
             Dictionary of indicator: value pairs
         """
-        import re
-        
         raw_text = response.get('raw_response', '')
         parsed_data = {}
         
-        # Simple pattern matching for numbers
-        # Format: "Revenue: 1,234.56" or "EBITDA: Rs. 500.00 Cr"
-        patterns = [
-            r'(?:Revenue|Total Income).*?(\d+(?:,\d+)*(?:\.\d+)?)',
-            r'EBITDA.*?(\d+(?:,\d+)*(?:\.\d+)?)',
-            r'EBIT.*?(\d+(?:,\d+)*(?:\.\d+)?)',
-            r'PBT.*?(\d+(?:,\d+)*(?:\.\d+)?)',
-            r'PAT.*?(\d+(?:,\d+)*(?:\.\d+)?)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, raw_text, re.IGNORECASE)
-            if match:
-                value_str = match.group(1).replace(',', '')
-                try:
-                    parsed_data[pattern.split('.*')[0].strip('?:()')] = float(value_str)
-                except ValueError:
-                    pass
+        # First value seen for each indicator wins
+        for match in _FIN_ALL.finditer(raw_text):
+            name = _FIN_KEYS[match['indicator'].lower()]
+            if name not in parsed_data:
+                parsed_data[name] = float(match['value'].translate(_COMMA_STRIP))
         
         logger.info(f"Parsed {len(parsed_data)} financial indicators")
         return parsed_data
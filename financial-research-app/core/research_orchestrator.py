@@ -1,19 +1,30 @@
 # Research Orchestrator
 # Coordinate multi-company financial research workflows
 
+import asyncio
+import threading
 import time
-from typing import Dict, List, Optional, Callable
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Callable, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from core.perplexity_client import PerplexityClient
 from core.data_extractor import FinancialDataExtractor
 from core.research_storage import ResearchStorage
 from core.data_models import QuarterlyData
 from utils.progress_tracker import ProgressTracker
 from utils.extraction_validator import ExtractionValidator
+from utils.rate_limit import TokenBucket
+from utils.fan_out import gather_company_quarters
 from config.logging_config import get_logger
 
 logger = get_logger('research_orchestrator')
 
+# Extracted indicators copied into QuarterlyData (extracted key == model field)
+_FIELDS = (
+    'total_income', 'employee_cost', 'other_expenses', 'depreciation',
+    'interest', 'other_income', 'tax',
+)
+
 class ResearchOrchestrator:
     """Orchestrate automated financial research for multiple companies"""
     
@@ -24,9 +35,22 @@ class ResearchOrchestrator:
         'Coforge', 'MPHASIS', 'Zensar', 'Hexaware', 'Birlasoft'
     ]
     
+    # Threads for extract/validate/save in parallel runs (CPU work is ~ms per item)
+    POSTPROCESS_WORKERS = 2
+    
+    # How often the background reporter checks for progress to print
+    PROGRESS_INTERVAL_SECONDS = 0.5
+    
+    # Failed API calls are retried after this delay, doubling per failure up to the cap
+    RETRY_BASE_SECONDS = 300
+    RETRY_MAX_SECONDS = 24 * 3600
+    
     def __init__(self, perplexity_client: PerplexityClient,
                  storage: ResearchStorage,
-                 extractor: Optional[FinancialDataExtractor] = None):
+                 extractor: Optional[FinancialDataExtractor] = None,
+                 requests_per_second: Optional[float] = None,
+                 burst: int = 3,
+                 ttl_days: int = 90):
         """
         Initialize research orchestrator
         
@@ -34,6 +58,9 @@ class ResearchOrchestrator:
             perplexity_client: Initialized Perplexity API client
             storage: Research storage instance
             extractor: Data extractor (creates new if None)
+            requests_per_second: API call pacing (default: the client's RPM / 60)
+            burst: API calls allowed back to back before pacing kicks in
+            ttl_days: Age after which stored successful research is fetched again
         """
         self.client = perplexity_client
         self.storage = storage
@@ -41,6 +68,28 @@ class ResearchOrchestrator:
         self.validator = ExtractionValidator()
         self.progress_tracker = None
         
+        # Paces API calls only - results already in storage are returned immediately
+        if requests_per_second is None:
+            rpm = getattr(getattr(perplexity_client, 'rate_limiter', None), 'requests_per_minute', 20)
+            requests_per_second = rpm / 60
+        self._rate_limiter = TokenBucket(requests_per_second, burst)
+        
+        self.ttl_days = ttl_days
+        # (company, quarter, year) -> (consecutive failures, next_retry_ts); in memory
+        # so failed attempts never land in storage next to real results
+        self._failures: Dict[Tuple[str, str, int], Tuple[int, float]] = {}
+        self._failures_lock = threading.Lock()
+    
+    def close(self):
+        """Release the Perplexity client's pooled HTTP connections"""
+        self.client.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        
     def research_company_quarter(self, company: str, quarter: str, year: int) -> Dict:
         """
         Research single company for one quarter
@@ -55,15 +104,90 @@ class ResearchOrchestrator:
         """
         logger.info(f"Researching {company} - {quarter} {year}")
         
-        # Check if already researched
-        existing = self.storage.load_research(company, quarter, year)
+        # Check if already researched (or a recent failure is still backing off)
+        existing = self._load_existing(company, quarter, year)
         if existing:
+            return existing
+        
+        return self._postprocess(self._fetch(company, quarter, year), company, quarter, year)
+    
+    def _fetch(self, company: str, quarter: str, year: int) -> Optional[Dict]:
+        """Query the Perplexity API for one company-quarter (network-bound stage)"""
+        self._rate_limiter.acquire()
+        return self.client.get_company_financials(company, quarter, year)
+    
+    def _is_fresh(self, research: Dict) -> bool:
+        """Whether stored research is a success saved within ttl_days"""
+        if research.get('status') != 'success':
+            return False
+        saved = research.get('save_timestamp')
+        if not saved:
+            return True
+        try:
+            return datetime.now() - datetime.fromisoformat(saved) < timedelta(days=self.ttl_days)
+        except ValueError:
+            return True
+    
+    def _load_existing(self, company: str, quarter: str, year: int) -> Optional[Dict]:
+        """
+        Return a result that makes an API call unnecessary, if there is one
+        
+        Fresh stored research is reused. While a failed item is backing off, its
+        stale stored research (or a failed result) is returned instead of retrying.
+        """
+        existing = self.storage.load_research(company, quarter, year)
+        if existing and self._is_fresh(existing):
             logger.info(f"Found existing research for {company} {quarter} {year}")
             return existing
         
-        # Query Perplexity API
-        result = self.client.get_company_financials(company, quarter, year)
+        with self._failures_lock:
+            failure = self._failures.get((company, quarter, year))
+        if failure and time.time() < failure[1]:
+            logger.info(f"Skipping {company} {quarter} {year} until retry backoff expires")
+            return existing or {
+                'company': company,
+                'quarter': quarter,
+                'year': year,
+                'status': 'failed',
+                'error': 'API query failed',
+                'next_retry_ts': failure[1]
+            }
+        return None
+    
+    def _record_attempt(self, company: str, quarter: str, year: int, ok: bool):
+        """Clear the backoff after a success, or push the next retry out after a failure"""
+        key = (company, quarter, year)
+        with self._failures_lock:
+            if ok:
+                self._failures.pop(key, None)
+                return
+            attempts = self._failures.get(key, (0, 0.0))[0] + 1
+            delay = min(self.RETRY_BASE_SECONDS * 2 ** (attempts - 1), self.RETRY_MAX_SECONDS)
+            self._failures[key] = (attempts, time.time() + delay)
+    
+    def _load_or_fetch(self, company: str, quarter: str, year: int) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """Return (existing result, None) if no API call is needed, else (None, API result)"""
+        existing = self._load_existing(company, quarter, year)
+        if existing:
+            return existing, None
         
+        logger.info(f"Researching {company} - {quarter} {year}")
+        return None, self._fetch(company, quarter, year)
+    
+    def _postprocess(self, result: Optional[Dict], company: str, quarter: str, year: int) -> Dict:
+        """
+        Extract, validate and save one API result (CPU/disk-bound stage)
+        
+        Args:
+            result: Response from PerplexityClient.get_company_financials (None on failure)
+            company: Company name
+            quarter: Quarter
+            year: Financial year
+            
+        Returns:
+            Research results dictionary
+        """
+        self._record_attempt(company, quarter, year, bool(result))
         if not result:
             logger.error(f"Failed to get data for {company} {quarter} {year}")
             return {
@@ -94,6 +218,7 @@ class ResearchOrchestrator:
             'status': 'success',
             'raw_response': raw_text,
             'extracted_data': extracted['extracted_data'],
+            'extractor_version': getattr(self.extractor, 'VERSION', None),
             'context_confidence': extracted['context_confidence'],
             'validation': validation_result,
             'research_timestamp': result.get('timestamp'),
@@ -120,34 +245,77 @@ class ResearchOrchestrator:
         Returns:
             Dictionary mapping quarter to research results
         """
-        results = {}
+        return {quarter: self._research_item(company, quarter, year) for quarter in quarters}
+    
+    def research_company_batch(self, company: str,
+                               periods: List[Tuple[str, int]]) -> Dict[Tuple[str, int], Dict]:
+        """
+        Research several quarters of one company with one API call per financial year
+        
+        Periods already in storage are reused; quarters the batched answer leaves
+        out fall back to a single-quarter query.
         
-        for quarter in quarters:
-            try:
-                result = self.research_company_quarter(company, quarter, year)
-                results[quarter] = result
-                
-                if self.progress_tracker:
-                    if result.get('status') == 'success':
-                        self.progress_tracker.complete_item(f"{company}_{quarter}")
-                    else:
-                        self.progress_tracker.fail_item(f"{company}_{quarter}", 
-                                                       result.get('error', 'Unknown'))
-                
-                # Small delay to respect rate limits
-                time.sleep(0.5)
-                
-            except Exception as e:
-                logger.error(f"Error researching {company} {quarter}: {e}")
-                results[quarter] = {
-                    'status': 'failed',
-                    'error': str(e)
-                }
-                if self.progress_tracker:
-                    self.progress_tracker.fail_item(f"{company}_{quarter}", str(e))
+        Args:
+            company: Company name
+            periods: (quarter, year) pairs, e.g. [('Q1', 2024), ('Q2', 2024)]
+            
+        Returns:
+            Dictionary mapping (quarter, year) to research results, in input order
+        """
+        results = {period: None for period in periods}
+        
+        # Group what still needs the API by year - one batched prompt per year
+        pending: Dict[int, List[str]] = {}
+        for quarter, year in results:
+            existing = self._load_existing(company, quarter, year)
+            if existing:
+                results[(quarter, year)] = existing
+            else:
+                pending.setdefault(year, []).append(quarter)
+        
+        for year, quarters in pending.items():
+            if len(quarters) == 1:
+                batch = {}
+            else:
+                logger.info(f"Researching {company} - {', '.join(quarters)} {year} in one request")
+                self._rate_limiter.acquire()
+                batch = self.client.get_company_financials_batch(company, quarters, year)
+            
+            for quarter in quarters:
+                api_result = batch.get(quarter)
+                if api_result is None:
+                    api_result = self._fetch(company, quarter, year)
+                results[(quarter, year)] = self._postprocess(api_result, company, quarter, year)
         
         return results
     
+    def _research_item(self, company: str, quarter: str, year: int) -> Dict:
+        """research_company_quarter plus progress tracking; errors become failed results"""
+        try:
+            return self._track_result(company, quarter, self.research_company_quarter(company, quarter, year))
+        except Exception as e:
+            return self._track_error(company, quarter, e)
+    
+    def _track_result(self, company: str, quarter: str, result: Dict) -> Dict:
+        """Record a finished item on the progress tracker and pass the result through"""
+        if self.progress_tracker:
+            if result.get('status') == 'success':
+                self.progress_tracker.complete_item(f"{company}_{quarter}")
+            else:
+                self.progress_tracker.fail_item(f"{company}_{quarter}", 
+                                               result.get('error', 'Unknown'))
+        return result
+    
+    def _track_error(self, company: str, quarter: str, error: Exception) -> Dict:
+        """Record an item that raised and return its failed result"""
+        logger.error(f"Error researching {company} {quarter}: {error}")
+        if self.progress_tracker:
+            self.progress_tracker.fail_item(f"{company}_{quarter}", str(error))
+        return {
+            'status': 'failed',
+            'error': str(error)
+        }
+    
     def research_all_companies(self, 
                               companies: Optional[List[str]] = None,
                               quarters: List[str] = ['Q1', 'Q2', 'Q3', 'Q4'],
@@ -172,28 +340,96 @@ class ResearchOrchestrator:
         if companies is None:
             companies = self.DEFAULT_COMPANIES
         
+        self._start_tracking(companies, quarters, year)
+        
+        stop_reporter = self._start_reporter()
+        try:
+            if parallel:
+                all_results = self._research_parallel(companies, quarters, year, max_workers)
+            else:
+                all_results = self._research_sequential(companies, quarters, year, progress_callback)
+        finally:
+            stop_reporter()
+        
+        logger.info("Research complete")
+        self.progress_tracker.print_progress()
+        
+        return all_results
+    
+    async def aresearch_all_companies(self,
+                                      companies: Optional[List[str]] = None,
+                                      quarters: List[str] = ['Q1', 'Q2', 'Q3', 'Q4'],
+                                      year: int = 2024,
+                                      max_concurrency: int = 3) -> Dict:
+        """
+        Async variant of research_all_companies with every (company, quarter) in flight together
+        
+        Args:
+            companies: List of company names (uses default if None)
+            quarters: List of quarters to research
+            year: Financial year
+            max_concurrency: Cap on concurrent research items
+            
+        Returns:
+            Dictionary mapping company to research results
+        """
+        if companies is None:
+            companies = self.DEFAULT_COMPANIES
+        
+        self._start_tracking(companies, quarters, year)
+        self.client.configure_pool(max_concurrency)
+        
+        stop_reporter = self._start_reporter()
+        try:
+            all_results = await gather_company_quarters(self._research_item, companies, quarters,
+                                                        year, max_concurrency)
+        finally:
+            stop_reporter()
+        
+        logger.info("Research complete")
+        await asyncio.to_thread(self.progress_tracker.print_progress)
+        
+        return all_results
+    
+    def _start_tracking(self, companies: List[str], quarters: List[str], year: int):
+        """Create a fresh progress tracker with every (company, quarter) registered"""
         total_items = len(companies) * len(quarters)
         self.progress_tracker = ProgressTracker(total_items)
         
         logger.info(f"Starting research for {len(companies)} companies, {len(quarters)} quarters")
         
         # Initialize all items in progress tracker
-        for company in companies:
-            for quarter in quarters:
-                item_id = f"{company}_{quarter}"
-                self.progress_tracker.start_item(item_id, f"{company} - {quarter} {year}")
+        self.progress_tracker.start_items([(f"{company}_{quarter}", f"{company} - {quarter} {year}")
+                                           for company in companies for quarter in quarters])
+    
+    def _start_reporter(self) -> Callable[[], None]:
+        """
+        Print progress from a background thread whenever it changes
         
-        all_results = {}
+        Workers only update tracker state, so they never block on stdout.
         
-        if parallel:
-            all_results = self._research_parallel(companies, quarters, year, max_workers)
-        else:
-            all_results = self._research_sequential(companies, quarters, year, progress_callback)
+        Returns:
+            Function that stops the reporter and waits for it to exit
+        """
+        stop = threading.Event()
+        tracker = self.progress_tracker
         
-        logger.info("Research complete")
-        self.progress_tracker.print_progress()
+        def report_loop():
+            last_processed = 0
+            while not stop.wait(self.PROGRESS_INTERVAL_SECONDS):
+                processed = tracker.completed_items + tracker.failed_items
+                if processed != last_processed:
+                    last_processed = processed
+                    tracker.print_progress()
         
-        return all_results
+        reporter = threading.Thread(target=report_loop, name='progress-reporter', daemon=True)
+        reporter.start()
+        
+        def stop_reporter():
+            stop.set()
+            reporter.join()
+        
+        return stop_reporter
     
     def _research_sequential(self, companies: List[str], quarters: List[str], 
                             year: int, progress_callback: Optional[Callable]) -> Dict:
@@ -206,36 +442,48 @@ class ResearchOrchestrator:
             
             if progress_callback:
                 progress_callback(self.progress_tracker.get_summary())
-            
-            if self.progress_tracker:
-                self.progress_tracker.print_progress()
         
         return results
     
     def _research_parallel(self, companies: List[str], quarters: List[str],
                           year: int, max_workers: int) -> Dict:
-        """Research companies in parallel"""
-        results = {}
+        """
+        Research (company, quarter) pairs in parallel, so every worker stays busy
+        
+        API calls run on one pool while extraction, validation and saving of
+        finished responses run on another, overlapping CPU work with network waits.
+        """
+        # Pre-seed so the output keeps input order regardless of completion order
+        results = {company: {quarter: None for quarter in quarters} for company in companies}
         
-        def research_task(company):
-            return company, self.research_company_all_quarters(company, quarters, year)
+        # Size the shared session's pool before the workers start using it
+        self.client.configure_pool(max_workers)
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(research_task, company): company 
-                      for company in companies}
+        with ThreadPoolExecutor(max_workers=max_workers) as fetch_pool, \
+                ThreadPoolExecutor(max_workers=self.POSTPROCESS_WORKERS) as postprocess_pool:
+            pending = {fetch_pool.submit(self._load_or_fetch, company, quarter, year): (company, quarter)
+                      for company in companies for quarter in quarters}
             
-            for future in as_completed(futures):
-                try:
-                    company, research_results = future.result()
-                    results[company] = research_results
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    company, quarter = pending.pop(future)
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        results[company][quarter] = self._track_error(company, quarter, e)
+                        continue
+                    
+                    # Fetch stage yields a tuple; hand fresh responses to the postprocess pool
+                    if isinstance(outcome, tuple):
+                        existing, api_result = outcome
+                        if existing is None:
+                            pending[postprocess_pool.submit(self._postprocess, api_result,
+                                                            company, quarter, year)] = (company, quarter)
+                            continue
+                        outcome = existing
                     
-                    if self.progress_tracker:
-                        self.progress_tracker.print_progress()
-                        
-                except Exception as e:
-                    company = futures[future]
-                    logger.error(f"Error processing {company}: {e}")
-                    results[company] = {'status': 'failed', 'error': str(e)}
+                    results[company][quarter] = self._track_result(company, quarter, outcome)
         
         return results
     
@@ -268,30 +516,18 @@ class ResearchOrchestrator:
         
         extracted = research.get('extracted_data', {})
         
-        # Map extracted data to QuarterlyData fields
+        # Map extracted indicators straight into the constructor
+        kwargs = {field_name: extracted[field_name].get('value')
+                  for field_name in _FIELDS if field_name in extracted}
+        
         q_data = QuarterlyData(
             company=company,
             quarter=quarter,
             year=year,
-            data_source='Perplexity AI + NLP Extraction'
+            data_source='Perplexity AI + NLP Extraction',
+            **kwargs
         )
         
-        # Map extracted indicators
-        field_mapping = {
-            'total_income': 'total_income',
-            'employee_cost': 'employee_cost',
-            'other_expenses': 'other_expenses',
-            'depreciation': 'depreciation',
-            'interest': 'interest',
-            'other_income': 'other_income',
-            'tax': 'tax',
-        }
-        
-        for extracted_key, model_field in field_mapping.items():
-            if extracted_key in extracted:
-                value = extracted[extracted_key].get('value')
-                setattr(q_data, model_field, value)
-        
         # Calculate derived metrics
         q_data.calculate_derived_metrics()
         
@@ -1,14 +1,70 @@
 # Research Storage System
 # Store and retrieve research results with versioning
 
-import json
+import hashlib
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
 from datetime import datetime
 from config.logging_config import get_logger
+from utils.json_codec import dump_json, load_json, orjson
 
 logger = get_logger('research_storage')
 
+
+def raw_response_hash(raw_response: str) -> str:
+    """Short content hash of a raw API response, stored as 'raw_hash' on saved research"""
+    return hashlib.blake2b(raw_response.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def write_atomic(file_path: Path, payload: bytes):
+    """
+    Write bytes via a temp file and os.replace, so readers never see a partial file
+    
+    No fsync: results can always be fetched again, only torn writes matter.
+    """
+    tmp_path = file_path.with_name(f"{file_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+# Files at least this large are mapped instead of read; below it mmap setup costs more than the copy
+MMAP_MIN_BYTES = 64 * 1024
+
+
+def read_research_file(file_path: Path, size: int) -> Dict:
+    """
+    Parse a research file, mapping large files straight into orjson without a userspace copy
+    
+    Args:
+        file_path: Research JSON file
+        size: File size in bytes (from the caller's stat)
+    """
+    if orjson is None or size < MMAP_MIN_BYTES:
+        return load_json(file_path.read_bytes())
+    
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # Release the view before the map closes
+        with memoryview(mm) as view:
+            return orjson.loads(view)
+
+
+@lru_cache(maxsize=256)
+def _research_file_path(storage_dir: Path, company: str, quarter: str, year: int) -> Path:
+    """Research file path for a company-quarter; pure, so cached across calls and instances"""
+    filename = f"{company.replace(' ', '_')}_{quarter}_{year}.json"
+    return storage_dir / filename
+
+
 class ResearchStorage:
     """Manage storage and retrieval of research results"""
     
@@ -21,11 +77,44 @@ class ResearchStorage:
         """
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(parents=True, exist_ok=True)
+        # LRU of parsed files keyed by path, validated against (mtime_ns, size) on every read
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = 256
+        self._cache_lock = threading.Lock()
+    
+    def _read_json(self, file_path: Path) -> Dict:
+        """
+        Load a research file, reusing the parsed dict while the file is unchanged on disk
+        
+        The returned dict is shared between callers - treat it as read-only.
+        Raises FileNotFoundError if the file does not exist.
+        """
+        stat = file_path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        
+        with self._cache_lock:
+            entry = self._cache.get(file_path)
+            if entry and entry[0] == signature:
+                self._cache.move_to_end(file_path)
+                return entry[1]
+        
+        data = read_research_file(file_path, stat.st_size)
+        
+        with self._cache_lock:
+            self._cache[file_path] = (signature, data)
+            self._cache.move_to_end(file_path)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return data
+    
+    def _invalidate(self, file_path: Path):
+        """Drop a file from the in-process cache"""
+        with self._cache_lock:
+            self._cache.pop(file_path, None)
         
     def _get_file_path(self, company: str, quarter: str, year: int) -> Path:
         """Generate file path for research result"""
-        filename = f"{company.replace(' ', '_')}_{quarter}_{year}.json"
-        return self.storage_dir / filename
+        return _research_file_path(self.storage_dir, company, quarter, year)
     
     def save_research(self, research_data: Dict) -> bool:
         """
@@ -47,9 +136,11 @@ class ResearchStorage:
             # Add metadata
             research_data['save_timestamp'] = datetime.now().isoformat()
             research_data['version'] = research_data.get('version', 1)
+            if research_data.get('raw_response'):
+                research_data['raw_hash'] = raw_response_hash(research_data['raw_response'])
             
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(research_data, f, indent=2)
+            write_atomic(file_path, dump_json(research_data))
+            self._invalidate(file_path)
             
             logger.info(f"Saved research: {company} {quarter} {year}")
             return True
@@ -73,13 +164,12 @@ class ResearchStorage:
         try:
             file_path = self._get_file_path(company, quarter, year)
             
-            if not file_path.exists():
+            try:
+                data = self._read_json(file_path)
+            except FileNotFoundError:
                 logger.debug(f"No saved research found for {company} {quarter} {year}")
                 return None
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
             logger.info(f"Loaded research: {company} {quarter} {year}")
             return data
             
@@ -87,6 +177,43 @@ class ResearchStorage:
             logger.error(f"Error loading research: {e}")
             return None
     
+    def iter_all_research(self, company: Optional[str] = None,
+                          max_workers: int = 8) -> Iterator[Dict]:
+        """
+        Yield stored research results one at a time
+        
+        Files are read on a small thread pool a chunk at a time, so disk reads
+        overlap without holding every result in memory. Reads bypass the
+        load_research() memo, so a full scan leaves nothing resident.
+        Unreadable files are logged and skipped.
+        
+        Args:
+            company: Filter by company name (None for all)
+            max_workers: Parallel file reads
+            
+        Yields:
+            Research data dictionaries
+        """
+        # One scandir pass filtering on names - no Path objects for skipped files
+        prefix = company.replace(' ', '_') + '_' if company else ''
+        with os.scandir(self.storage_dir) as entries:
+            paths = [Path(entry.path) for entry in entries
+                     if entry.name.endswith('.json') and entry.name.startswith(prefix)]
+        
+        def read(file_path: Path) -> Optional[Dict]:
+            try:
+                return read_research_file(file_path, file_path.stat().st_size)
+            except Exception as e:
+                logger.error(f"Error loading research {file_path.name}: {e}")
+                return None
+        
+        chunk = max_workers * 4
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for start in range(0, len(paths), chunk):
+                for data in executor.map(read, paths[start:start + chunk]):
+                    if data is not None:
+                        yield data
+    
     def get_all_research(self, company: Optional[str] = None) -> List[Dict]:
         """
         Get all stored research results
@@ -97,23 +224,9 @@ class ResearchStorage:
         Returns:
             List of research data dictionaries
         """
-        results = []
-        
-        try:
-            for file_path in self.storage_dir.glob("*.json"):
-                if company and not file_path.stem.startswith(company.replace(' ', '_')):
-                    continue
-                
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    results.append(data)
-            
-            logger.info(f"Loaded {len(results)} research results")
-            return results
-            
-        except Exception as e:
-            logger.error(f"Error loading all research: {e}")
-            return results
+        results = list(self.iter_all_research(company))
+        logger.info(f"Loaded {len(results)} research results")
+        return results
     
     def delete_research(self, company: str, quarter: str, year: int) -> bool:
         """Delete specific research result"""
@@ -121,6 +234,7 @@ class ResearchStorage:
             file_path = self._get_file_path(company, quarter, year)
             if file_path.exists():
                 file_path.unlink()
+                self._invalidate(file_path)
                 logger.info(f"Deleted research: {company} {quarter} {year}")
                 return True
             return False
@@ -130,33 +244,33 @@ class ResearchStorage:
     
     def get_research_summary(self) -> Dict:
         """Get summary of all stored research"""
-        all_research = self.get_all_research()
-        
+        research_count = 0
         companies = set()
-        quarters_years = set()
+        periods = set()
         total_extractions = 0
-        avg_confidence = 0.0
+        confidence_sum = 0.0
         
-        for research in all_research:
+        # Aggregate while streaming - no list of every result is built; periods
+        # are kept as (quarter, year) tuples and formatted once at the end
+        for research in self.iter_all_research():
+            research_count += 1
             companies.add(research['company'])
-            quarters_years.add(f"{research['quarter']} {research['year']}")
+            periods.add((research['quarter'], research['year']))
             
-            if 'extracted_data' in research:
-                total_extractions += len(research['extracted_data'])
-                
-                # Calculate average confidence
-                for indicator_data in research['extracted_data'].values():
-                    avg_confidence += indicator_data.get('confidence', 0)
+            extracted = research.get('extracted_data')
+            if extracted:
+                total_extractions += len(extracted)
+                confidence_sum += sum(indicator_data.get('confidence', 0)
+                                      for indicator_data in extracted.values())
         
-        if total_extractions > 0:
-            avg_confidence /= total_extractions
+        avg_confidence = confidence_sum / total_extractions if total_extractions else 0.0
         
         return {
-            'total_research_count': len(all_research),
+            'total_research_count': research_count,
             'unique_companies': len(companies),
-            'unique_periods': len(quarters_years),
+            'unique_periods': len(periods),
             'total_extractions': total_extractions,
             'average_confidence': round(avg_confidence, 2),
-            'companies': sorted(list(companies)),
-            'periods': sorted(list(quarters_years))
+            'companies': sorted(companies),
+            'periods': sorted(f"{quarter} {year}" for quarter, year in periods)
         }
@@ -0,0 +1,40 @@
+# Extraction Summary
+# Human-readable text summary shared by the Perplexity/Moneycontrol data sources
+
+from typing import Dict, Iterator
+
+_INDICATOR_LINE = "  {}: ₹{:.2f} Cr (conf: {:.2f})"
+
+
+def iter_extraction_lines(result: Dict) -> Iterator[str]:
+    """
+    Yield the summary lines for one extraction result
+
+    Args:
+        result: Extraction result with company, quarter, year, source,
+            context_confidence and extracted_data
+
+    Yields:
+        One line of text at a time
+    """
+    yield f"Company: {result.get('company', 'N/A')}"
+    yield f"Period: {result.get('quarter', 'N/A')} {result.get('year', 'N/A')}"
+    yield f"Source: {result.get('source', 'Unknown')}"
+    yield f"Confidence: {result.get('context_confidence', 0):.2f}"
+    yield "\nExtracted Indicators:"
+
+    data = result.get('extracted_data') or {}
+    if not data:
+        yield "  No data extracted"
+        return
+
+    yield from (
+        _INDICATOR_LINE.format(indicator, values['value'], values.get('confidence', 0))
+        if isinstance(values, dict) and 'value' in values else f"  {indicator}: {values}"
+        for indicator, values in data.items()
+    )
+
+
+def format_extraction(result: Dict) -> str:
+    """Generate a human-readable summary of an extraction result"""
+    return '\n'.join(iter_extraction_lines(result))
@@ -4,26 +4,32 @@ Fix Extraction Issues Script
 Re-extract data from raw responses for TCS and Tech Mahindra to fix missing Op. PBT and PBT issues
 """
 
-import json
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from core.data_extractor import FinancialDataExtractor
+from core.research_storage import raw_response_hash, write_atomic
+from utils.json_codec import dump_json, load_json
 from config.logging_config import setup_logging, get_logger
 
 setup_logging()
 logger = get_logger('fix_extraction')
 
+# Keeps each file's comparison report together on stdout
+_print_lock = threading.Lock()
+
 def fix_research_file(file_path: Path, extractor: FinancialDataExtractor):
     """Re-extract data from a research result file"""
     logger.info(f"Processing {file_path.name}")
     
     # Load existing file
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    original = file_path.read_bytes()
+    data = load_json(original)
     
     # Get raw response
     raw_response = data.get('raw_response', '')
@@ -35,6 +41,12 @@ def fix_research_file(file_path: Path, extractor: FinancialDataExtractor):
     quarter = data.get('quarter', '')
     year = data.get('year', 0)
     
+    # Same raw text through the same extractor version gives the same result - skip it
+    raw_hash = raw_response_hash(raw_response)
+    if data.get('raw_hash') == raw_hash and data.get('extractor_version') == extractor.VERSION:
+        logger.info(f"{file_path.name} already extracted from this response, skipping")
+        return False
+    
     logger.info(f"Re-extracting data for {company} {quarter} {year}")
     
     # Re-extract using improved extractor
@@ -44,42 +56,43 @@ def fix_research_file(file_path: Path, extractor: FinancialDataExtractor):
     old_data = data.get('extracted_data', {})
     new_data = extracted['extracted_data']
     
-    print(f"\n{'='*60}")
-    print(f"File: {file_path.name}")
-    print(f"Company: {company} {quarter} {year}")
-    print(f"{'='*60}")
-    
-    print("\nOLD EXTRACTION:")
-    for key, val in old_data.items():
-        print(f"  {key}: {val['value']} (conf: {val['confidence']})")
+    # Build the comparison first and print it in one go - files are fixed in parallel
+    report = [
+        f"\n{'='*60}",
+        f"File: {file_path.name}",
+        f"Company: {company} {quarter} {year}",
+        f"{'='*60}",
+        "\nOLD EXTRACTION:",
+    ]
+    report.extend(f"  {key}: {val['value']} (conf: {val['confidence']})" for key, val in old_data.items())
     
-    print("\nNEW EXTRACTION:")
-    for key, val in new_data.items():
-        print(f"  {key}: {val['value']} (conf: {val['confidence']})")
+    report.append("\nNEW EXTRACTION:")
+    report.extend(f"  {key}: {val['value']} (conf: {val['confidence']})" for key, val in new_data.items())
     
-    print("\nADDED FIELDS:")
+    report.append("\nADDED FIELDS:")
     added = set(new_data.keys()) - set(old_data.keys())
-    for key in added:
-        print(f"  ✓ {key}: {new_data[key]['value']}")
+    report.extend(f"  ✓ {key}: {new_data[key]['value']}" for key in added)
     
-    print("\nREMOVED/FIXED FIELDS:")
+    report.append("\nREMOVED/FIXED FIELDS:")
     removed = set(old_data.keys()) - set(new_data.keys())
-    for key in removed:
-        print(f"  ✗ {key}: {old_data[key]['value']} (likely incorrect)")
+    report.extend(f"  ✗ {key}: {old_data[key]['value']} (likely incorrect)" for key in removed)
+    
+    with _print_lock:
+        print('\n'.join(report))
     
     # Update file
     data['extracted_data'] = new_data
     data['context_confidence'] = extracted['context_confidence']
+    data['raw_hash'] = raw_hash
+    data['extractor_version'] = extractor.VERSION
     
-    # Backup original
+    # Backup original (the bytes as loaded, before re-extraction)
     backup_path = file_path.with_suffix('.json.backup')
-    with open(backup_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    write_atomic(backup_path, original)
     logger.info(f"Created backup: {backup_path.name}")
     
     # Save updated file
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    write_atomic(file_path, dump_json(data))
     logger.info(f"Updated {file_path.name}")
     
     return True
@@ -108,16 +121,23 @@ def main():
     
     fixed_count = 0
     
+    existing = []
     for filename in problem_files:
-        file_path = results_dir / filename
-        if file_path.exists():
+        if (results_dir / filename).exists():
+            existing.append(filename)
+        else:
+            logger.warning(f"File not found: {filename}")
+    
+    # Files are independent and the extractor is read-only, so fix them concurrently
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(existing)))) as executor:
+        futures = {executor.submit(fix_research_file, results_dir / filename, extractor): filename
+                   for filename in existing}
+        for future in as_completed(futures):
             try:
-                if fix_research_file(file_path, extractor):
+                if future.result():
                     fixed_count += 1
             except Exception as e:
-                logger.error(f"Error processing {filename}: {e}")
-        else:
-            logger.warning(f"File not found: {filename}")
+                logger.error(f"Error processing {futures[future]}: {e}")
     
     print("\n" + "="*60)
     print(f"SUMMARY: Fixed {fixed_count} files")
@@ -4,6 +4,8 @@ Live Demo - Test Phase 2 with Real Perplexity API
 Tests actual API calls and data extraction
 """
 
+import asyncio
+import re
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
@@ -24,6 +26,10 @@ class C:
     B = '\033[94m'
     E = '\033[0m'
 
+# Extraction summary lines to highlight: headers in blue, amounts in green
+HI = re.compile(r'Company:|Period:|Context')
+MONEY = re.compile(r'₹')
+
 def main():
     print(f"\n{C.H}{'='*60}{C.E}")
     print(f"{C.H}  Live Demo - Financial Research with Perplexity API{C.E}")
@@ -82,12 +88,8 @@ def main():
             print(f"{C.H}Extraction Results:{C.E}")
             summary = result.get('extraction_summary', '')
             for line in summary.split('\n'):
-                if 'Company:' in line or 'Period:' in line or 'Context' in line:
-                    print(f"{C.B}{line}{C.E}")
-                elif '₹' in line:
-                    print(f"{C.G}{line}{C.E}")
-                else:
-                    print(line)
+                color = C.B if HI.search(line) else C.G if MONEY.search(line) else ''
+                print(f"{color}{line}{C.E}" if color else line)
             
             # Show confidence analysis
             extracted_data = result.get('extracted_data', {})
@@ -106,6 +108,20 @@ def main():
             print(f"\n{C.H}Storage:{C.E}")
             print(f"{C.G}✓ Research saved to: {settings.RESEARCH_RESULTS_DIR}/TCS_Q1_2024.json{C.E}")
             
+            # Batched path: the remaining quarters in one request (Q1 comes from storage)
+            quarters = ['Q1', 'Q2', 'Q3', 'Q4']
+            print(f"\n{C.H}Batched research: TCS Q1-Q4 FY2024{C.E}")
+            batch = orchestrator.research_company_batch('TCS', [(q, 2024) for q in quarters])
+            for (quarter, year), research in batch.items():
+                color = C.G if research.get('status') == 'success' else C.Y
+                print(f"{color}  {quarter} {year}: {research.get('status', 'unknown')}{C.E}")
+            
+            # Concurrent path over the same quarters - all served from storage now
+            print(f"\n{C.H}Concurrent research: TCS Q1-Q4 FY2024 (second pass){C.E}")
+            concurrent = asyncio.run(orchestrator.aresearch_all_companies(['TCS'], quarters, 2024))
+            succeeded = sum(1 for r in concurrent['TCS'].values() if r.get('status') == 'success')
+            print(f"{C.G}  {succeeded}/{len(quarters)} quarters available{C.E}")
+            
             # Show cache stats
             cache_stats = cache.get_stats()
             print(f"\n{C.H}Cache Statistics:{C.E}")
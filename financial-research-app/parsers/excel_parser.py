@@ -12,15 +12,20 @@ logger = get_logger('excel_parser')
 class ExcelParser:
     """Excel file parser for financial research templates"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, read_only: bool = True):
         """
         Initialize parser with Excel file
         
         Args:
             file_path: Path to Excel file
+            read_only: Stream sheets instead of building the full cell tree
+                (call close() when done to release the file handle)
         """
         self.file_path = Path(file_path)
+        self.read_only = read_only
         self.workbook = None
+        # Sheet name -> row value tuples, read once for quarterly lookups
+        self._row_cache: Dict[str, List[tuple]] = {}
         self.validation_errors = []
         
     def load_file(self) -> bool:
@@ -35,7 +40,8 @@ class ExcelParser:
                 self.validation_errors.append(f"File not found: {self.file_path}")
                 return False
             
-            self.workbook = openpyxl.load_workbook(self.file_path, data_only=True)
+            self.workbook = openpyxl.load_workbook(self.file_path, read_only=self.read_only,
+                                                   data_only=True, keep_links=False)
             logger.info(f"Loaded Excel file: {self.file_path}")
             return True
             
@@ -73,18 +79,12 @@ class ExcelParser:
             companies = []
             
             # Read until we hit an empty cell
-            row = start_row
-            while True:
-                cell_value = sheet.cell(row=row, column=company_col).value
-                
-                if cell_value is None or str(cell_value).strip() == '':
+            for (cell_value,) in sheet.iter_rows(min_row=start_row, min_col=company_col,
+                                                 max_col=company_col, values_only=True):
+                company_name = str(cell_value).strip() if cell_value is not None else ''
+                if not company_name:
                     break
-                
-                company_name = str(cell_value).strip()
-                if company_name:
-                    companies.append(company_name)
-                
-                row += 1
+                companies.append(company_name)
             
             logger.info(f"Extracted {len(companies)} companies from {sheet_name or 'active sheet'}")
             return companies
@@ -105,11 +105,13 @@ class ExcelParser:
         Returns:
             Row number (1-indexed) or None
         """
-        for row in range(1, min(20, sheet.max_row + 1)):  # Search first 20 rows
-            row_values = [str(cell.value).lower() if cell.value else '' 
-                         for cell in sheet[row]]
+        terms = [term.lower() for term in search_terms]
+        
+        # Search first 20 rows
+        for row, values in enumerate(sheet.iter_rows(max_row=19, values_only=True), start=1):
+            row_text = ' '.join(str(value).lower() if value else '' for value in values)
             
-            if any(term.lower() in ' '.join(row_values) for term in search_terms):
+            if any(term in row_text for term in terms):
                 return row
         
         return None
@@ -168,20 +170,63 @@ class ExcelParser:
             return {}
         
         try:
-            sheet = self.workbook[sheet_name]
-            quarterly_data = {}
+            rows = self._sheet_rows(sheet_name)
+            row_values = rows[company_row - 1] if 0 < company_row <= len(rows) else ()
+            return self._row_quarters(row_values, quarter_cols)
             
-            for quarter, col in quarter_cols.items():
-                value = sheet.cell(row=company_row, column=col).value
-                if value is not None and isinstance(value, (int, float)):
-                    quarterly_data[quarter] = float(value)
+        except Exception as e:
+            logger.error(f"Error extracting quarterly data: {e}")
+            return {}
+    
+    def bulk_extract(self, sheet_name: str, companies_rows: Dict[int, str],
+                     quarter_cols: Dict[str, int]) -> Dict[str, Dict[str, float]]:
+        """
+        Extract quarterly data for many companies from one pass over the sheet
+        
+        Args:
+            sheet_name: Sheet containing data
+            companies_rows: Dictionary mapping row number to company name
+            quarter_cols: Dictionary mapping quarter names to column indices
             
-            return quarterly_data
+        Returns:
+            Dictionary mapping company to {quarter: value}
+        """
+        if not self.workbook:
+            return {}
+        
+        try:
+            rows = self._sheet_rows(sheet_name)
+            return {
+                company: self._row_quarters(rows[row - 1] if 0 < row <= len(rows) else (), quarter_cols)
+                for row, company in companies_rows.items()
+            }
             
         except Exception as e:
             logger.error(f"Error extracting quarterly data: {e}")
             return {}
     
+    def _sheet_rows(self, sheet_name: str) -> List[tuple]:
+        """
+        All row values of a sheet, read once per sheet
+        
+        Read-only sheets re-scan their XML on every iter_rows call, so per-row
+        lookups would be quadratic without this.
+        """
+        rows = self._row_cache.get(sheet_name)
+        if rows is None:
+            rows = self._row_cache[sheet_name] = list(self.workbook[sheet_name].iter_rows(values_only=True))
+        return rows
+    
+    @staticmethod
+    def _row_quarters(row_values: tuple, quarter_cols: Dict[str, int]) -> Dict[str, float]:
+        """Numeric cells of one row by quarter (rows may stop at the last filled cell)"""
+        quarterly_data = {}
+        for quarter, col in quarter_cols.items():
+            value = row_values[col - 1] if col <= len(row_values) else None
+            if value is not None and isinstance(value, (int, float)):
+                quarterly_data[quarter] = float(value)
+        return quarterly_data
+    
     def get_validation_errors(self) -> List[str]:
         """Get all validation errors"""
         return self.validation_errors
@@ -190,6 +235,7 @@ class ExcelParser:
         """Close the workbook"""
         if self.workbook:
             self.workbook.close()
+            self._row_cache.clear()
             logger.info("Workbook closed")
 
 
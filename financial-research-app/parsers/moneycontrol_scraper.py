@@ -1,14 +1,158 @@
 # Moneycontrol Quarterly Financial Data Scraper
 # Extracts quarterly financial indicators from Moneycontrol portal
 
+import asyncio
 import re
+import sys
 import requests
+from requests.adapters import HTTPAdapter
+from functools import lru_cache
+from html.parser import HTMLParser
 from typing import Dict, List, Optional, Tuple
-from bs4 import BeautifulSoup
 from config.logging_config import get_logger
+from config.settings import MONEYCONTROL_CACHE_DIR, MONEYCONTROL_PAGE_CACHE
+from utils.alias_matcher import AliasMatcher
+from utils.page_cache import shared_page_cache
+from utils.rate_limit import TokenBucket
 
 logger = get_logger('moneycontrol_scraper')
 
+# Quarter headers like "Q1 FY25", "Q2 2024", "FY25"
+_QUARTER_RE = re.compile(r'(q[1-4]|fy)\s*(?:fy)?(\d{2,4})?')
+# Number with optional thousands separators and decimal part
+_VALUE_RE = re.compile(r'([\d,]+\.?\d*)')
+# A bare number like '1,234.5' - the common cell, parsed without the cleanup passes
+_PLAIN_NUMBER_RE = re.compile(r'[\d,]*\d(?:\.\d+)?')
+
+
+@lru_cache(maxsize=2048)
+def _company_url(url_pattern: str, company_name: str) -> str:
+    """Format a company URL from its slug (lowercase, hyphens); pure, so cached"""
+    return url_pattern.format(company_slug=company_name.lower().replace(' ', '-'))
+
+
+class _TableStream(HTMLParser):
+    """
+    Event-driven table reader: keeps only the cell text of open tables, never a DOM
+    
+    Finished tables are appended to `completed` as lists of rows (lists of cell
+    text, stripped like get_text(strip=True)) for the caller to drain between feeds.
+    Nested tables are read as separate tables.
+    """
+    
+    _SKIP_TAGS = ('script', 'style')
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.completed: List[List[List[str]]] = []
+        # One [rows, current row, current cell pieces] per open table, innermost last
+        self._open: List[list] = []
+        self._skip_depth = 0
+        # Raw text since the last tag - data can arrive split across feed() chunks
+        self._text: List[str] = []
+    
+    def _flush_text(self):
+        """End the current text node, adding its stripped text to the open cell"""
+        if self._text:
+            text = ''.join(self._text).strip()
+            self._text.clear()
+            if text and self._open and self._open[-1][2] is not None:
+                self._open[-1][2].append(text)
+    
+    def _close_cell(self, table: list):
+        if table[2] is not None:
+            table[1].append(''.join(table[2]))
+            table[2] = None
+    
+    def _close_row(self, table: list):
+        self._close_cell(table)
+        if table[1] is not None:
+            table[0].append(table[1])
+            table[1] = None
+    
+    def _close_table(self):
+        table = self._open.pop()
+        self._close_row(table)
+        self.completed.append(table[0])
+    
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag == 'table':
+            self._open.append([[], None, None])
+        elif tag in self._SKIP_TAGS:
+            self._skip_depth += 1
+        elif self._open:
+            table = self._open[-1]
+            if tag == 'tr':
+                self._close_row(table)
+                table[1] = []
+            elif tag in ('td', 'th') and table[1] is not None:
+                self._close_cell(table)
+                table[2] = []
+    
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag in self._SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif not self._open:
+            return
+        elif tag == 'table':
+            self._close_table()
+        elif tag == 'tr':
+            self._close_row(self._open[-1])
+        elif tag in ('td', 'th'):
+            self._close_cell(self._open[-1])
+    
+    def handle_data(self, data):
+        if self._open and not self._skip_depth and self._open[-1][2] is not None:
+            self._text.append(data)
+    
+    def handle_comment(self, data):
+        self._flush_text()
+    
+    def close(self):
+        super().close()
+        self._flush_text()
+        # Unclosed tables at end of document still count
+        while self._open:
+            self._close_table()
+
+
+@lru_cache(maxsize=8192)
+def _parse_cell_value(text: str) -> Optional[float]:
+    """Parse a table cell's numeric value; pure, and cells like '-' or '0.00' repeat, so cached"""
+    if not text or text.strip() == '-' or text.strip() == 'N/A':
+        return None
+    
+    plain = _PLAIN_NUMBER_RE.fullmatch(text.strip())
+    if plain:
+        return float(plain.group().replace(',', ''))
+    
+    try:
+        # Remove common text patterns
+        cleaned = text.replace('₹', '').replace('Rs', '').replace('INR', '').strip()
+        
+        # Extract number with optional decimal
+        match = _VALUE_RE.search(cleaned)
+        if match:
+            num_str = match.group(1).replace(',', '')
+            value = float(num_str)
+            
+            # Handle unit suffixes (Cr, Lac, etc.)
+            if 'cr' in cleaned.lower():
+                return value  # Already in crores
+            elif 'lac' in cleaned.lower() or 'lakh' in cleaned.lower():
+                return value / 100  # Convert lakhs to crores
+            elif '%' in cleaned:
+                return value  # Percentage value
+            
+            return value
+    except (ValueError, AttributeError) as e:
+        logger.debug(f"Could not parse value '{text}': {e}")
+    
+    return None
+
+
 class MoneycontrolScraper:
     """Scrape quarterly financial data from Moneycontrol portal"""
     
@@ -33,20 +177,44 @@ class MoneycontrolScraper:
         'profit_margin': ['Profit Margin', 'Net Margin'],
     }
     
-    def __init__(self, timeout: int = 10):
+    # Lowercased aliases in INDICATORS order, for _match_indicator
+    _MATCHER = AliasMatcher((key, alias.lower(), None) for key, aliases in INDICATORS.items() for alias in aliases)
+    
+    # Row label -> matched indicator; labels repeat across tables and companies
+    _indicator_cache: Dict[str, Optional[str]] = {}
+    _INDICATOR_CACHE_SIZE = 4096
+    
+    # Characters fed to the table stream at a time
+    PARSE_CHUNK_CHARS = 64 * 1024
+    
+    # Keep-alive connections kept per host; covers ascrape_many-style concurrency
+    POOL_MAXSIZE = 16
+    
+    def __init__(self, timeout: int = 10, use_page_cache: bool = MONEYCONTROL_PAGE_CACHE,
+                 max_rps: float = 2.0, burst: int = 4, keep_raw: bool = True):
         """
         Initialize scraper
         
         Args:
             timeout: Request timeout in seconds
+            use_page_cache: Reuse pages fetched today from the on-disk page cache
+            max_rps: Sustained Moneycontrol requests per second
+            burst: Requests allowed back to back before pacing kicks in
+            keep_raw: Store each value's source cell text as 'raw_text' (off saves
+                memory when scraping many companies)
         """
         self.timeout = timeout
+        self.keep_raw = keep_raw
+        self.page_cache = shared_page_cache(MONEYCONTROL_CACHE_DIR) if use_page_cache else None
+        # Paces network requests only - page cache hits are not throttled
+        self._rate_limiter = TokenBucket(max_rps, burst)
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
+            # Only the codings urllib3 can decode here (adds br when brotli is installed)
+            'Accept-Encoding': requests.utils.DEFAULT_ACCEPT_ENCODING,
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
             'Sec-Fetch-Dest': 'document',
@@ -55,6 +223,10 @@ class MoneycontrolScraper:
             'Sec-Fetch-User': '?1',
             'Cache-Control': 'max-age=0'
         })
+        # Reuse warm connections across concurrent fetches instead of reconnecting
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.POOL_MAXSIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
     
     def get_company_url(self, company_name: str) -> str:
         """
@@ -66,9 +238,7 @@ class MoneycontrolScraper:
         Returns:
             Full URL for company's quarterly results page
         """
-        # Convert company name to slug format (lowercase, hyphens)
-        slug = company_name.lower().replace(' ', '-')
-        return self.BASE_URL_PATTERN.format(company_slug=slug)
+        return _company_url(self.BASE_URL_PATTERN, company_name)
     
     def fetch_page(self, url: str) -> Optional[str]:
         """
@@ -82,6 +252,11 @@ class MoneycontrolScraper:
         """
         try:
             logger.info(f"Fetching: {url}")
+            if self.page_cache is not None:
+                return self.page_cache.fetch(self.session, url, self.timeout,
+                                             throttle=self._rate_limiter.acquire)
+            
+            self._rate_limiter.acquire()
             response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
             return response.text
@@ -100,24 +275,24 @@ class MoneycontrolScraper:
         Returns:
             Dictionary mapping quarter to financial data
         """
-        soup = BeautifulSoup(html, 'html.parser')
         quarterly_data = {}
+        table_count = 0
         
         try:
-            # Find all tables on the page
-            tables = soup.find_all('table')
-            logger.info(f"Found {len(tables)} tables on page")
+            # Stream the page in chunks, processing each table as soon as it closes
+            stream = _TableStream()
+            for start in range(0, len(html), self.PARSE_CHUNK_CHARS):
+                stream.feed(html[start:start + self.PARSE_CHUNK_CHARS])
+                table_count += self._merge_tables(stream, quarterly_data)
+            stream.close()
+            table_count += self._merge_tables(stream, quarterly_data)
             
-            if not tables:
+            logger.info(f"Found {table_count} tables on page")
+            
+            if not table_count:
                 logger.warning("No tables found on page")
                 return quarterly_data
             
-            # Process each table
-            for table_idx, table in enumerate(tables):
-                table_data = self._extract_table_data(table)
-                if table_data:
-                    quarterly_data.update(table_data)
-            
             logger.info(f"Extracted data for {len(quarterly_data)} quarters")
             return quarterly_data
             
@@ -125,12 +300,24 @@ class MoneycontrolScraper:
             logger.error(f"Error parsing HTML: {e}")
             return quarterly_data
     
-    def _extract_table_data(self, table) -> Dict[str, Dict]:
+    def _merge_tables(self, stream: _TableStream, quarterly_data: Dict[str, Dict]) -> int:
+        """Extract every table the stream has finished into quarterly_data; returns how many"""
+        tables = stream.completed
+        for rows in tables:
+            table_data = self._extract_table_data(rows)
+            if table_data:
+                quarterly_data.update(table_data)
+        
+        count = len(tables)
+        tables.clear()
+        return count
+    
+    def _extract_table_data(self, rows: List[List[str]]) -> Dict[str, Dict]:
         """
         Extract financial data from a single table
         
         Args:
-            table: BeautifulSoup table element
+            rows: Table rows as lists of cell text (first row is the header)
             
         Returns:
             Dictionary of extracted quarterly data
@@ -138,15 +325,13 @@ class MoneycontrolScraper:
         quarterly_data = {}
         
         try:
-            rows = table.find_all('tr')
             if not rows or len(rows) < 2:
                 return quarterly_data
             
             # Get header row to identify quarters
-            header_row = rows[0]
-            headers = [th.get_text(strip=True) for th in header_row.find_all(['th', 'td'])]
+            headers = rows[0]
             
-            if not headers:
+            if not headers or not self._looks_quarterly(headers):
                 return quarterly_data
             
             # Identify quarter columns (look for Q1, Q2, Q3, Q4, FY patterns)
@@ -154,9 +339,9 @@ class MoneycontrolScraper:
             for idx, header in enumerate(headers):
                 header_lower = header.lower()
                 # Match patterns like "Q1 FY25", "Q2 2024", "FY25", etc.
-                quarter_match = re.search(r'(q[1-4]|fy)\s*(?:fy)?(\d{2,4})?', header_lower)
+                quarter_match = _QUARTER_RE.search(header_lower)
                 if quarter_match:
-                    quarter = quarter_match.group(1).upper()
+                    quarter = sys.intern(quarter_match.group(1).upper())
                     year_str = quarter_match.group(2)
                     
                     # Try to extract year
@@ -176,17 +361,20 @@ class MoneycontrolScraper:
             
             logger.debug(f"Found quarter columns: {quarter_cols}")
             
+            # (column, quarter key) looked up once per table, not per cell
+            quarter_slots = [(col_idx, info['quarter']) for col_idx, info in quarter_cols.items()]
+            keep_raw = self.keep_raw
+            
             # Extract data rows
-            for row_idx, row in enumerate(rows[1:], 1):
-                cells = [td.get_text(strip=True) for td in row.find_all(['td', 'th'])]
+            for cells in rows[1:]:
                 if not cells:
                     continue
                 
                 # Get indicator name from first column
                 indicator_name = cells[0].lower() if cells else ''
                 
-                # Skip empty rows
-                if not indicator_name or indicator_name.strip() == '':
+                # Skip empty rows, and numeric rows / separators that can't be indicator labels
+                if not indicator_name or not indicator_name[0].isalpha():
                     continue
                 
                 # Match against known indicators
@@ -194,19 +382,19 @@ class MoneycontrolScraper:
                 
                 if matched_indicator:
                     # Extract values for each quarter
-                    for col_idx, quarter_info in quarter_cols.items():
+                    for col_idx, quarter_key in quarter_slots:
                         if col_idx < len(cells):
                             value = self._parse_value(cells[col_idx])
                             if value is not None:
-                                quarter_key = quarter_info['quarter']
                                 if quarter_key not in quarterly_data:
                                     quarterly_data[quarter_key] = {}
                                 
-                                quarterly_data[quarter_key][matched_indicator] = {
-                                    'value': value,
-                                    'confidence': 0.9,
-                                    'raw_text': cells[col_idx]
-                                }
+                                # Built as one literal; callers update and serialise records as plain dicts
+                                if keep_raw:
+                                    record = {'value': value, 'confidence': 0.9, 'raw_text': cells[col_idx]}
+                                else:
+                                    record = {'value': value, 'confidence': 0.9}
+                                quarterly_data[quarter_key][matched_indicator] = record
             
             return quarterly_data
             
@@ -214,6 +402,11 @@ class MoneycontrolScraper:
             logger.error(f"Error extracting table data: {e}")
             return quarterly_data
     
+    @staticmethod
+    def _looks_quarterly(headers: List[str]) -> bool:
+        """Cheap pre-check: one regex scan over the whole header row instead of per cell"""
+        return _QUARTER_RE.search(' '.join(headers).lower()) is not None
+    
     def _match_indicator(self, text: str) -> Optional[str]:
         """
         Match text to known financial indicator
@@ -226,12 +419,17 @@ class MoneycontrolScraper:
         """
         text_lower = text.lower().strip()
         
-        for indicator_key, aliases in self.INDICATORS.items():
-            for alias in aliases:
-                if alias.lower() in text_lower or text_lower in alias.lower():
-                    return indicator_key
+        try:
+            return self._indicator_cache[text_lower]
+        except KeyError:
+            pass
         
-        return None
+        # First indicator (in INDICATORS order) whose alias contains or is contained in the label
+        matched = self._MATCHER.match(text_lower)
+        
+        if len(self._indicator_cache) < self._INDICATOR_CACHE_SIZE:
+            self._indicator_cache[text_lower] = matched
+        return matched
     
     def _parse_value(self, text: str) -> Optional[float]:
         """
@@ -243,32 +441,7 @@ class MoneycontrolScraper:
         Returns:
             Parsed float value or None
         """
-        if not text or text.strip() == '-' or text.strip() == 'N/A':
-            return None
-        
-        try:
-            # Remove common text patterns
-            cleaned = text.replace('₹', '').replace('Rs', '').replace('INR', '').strip()
-            
-            # Extract number with optional decimal
-            match = re.search(r'([\d,]+\.?\d*)', cleaned)
-            if match:
-                num_str = match.group(1).replace(',', '')
-                value = float(num_str)
-                
-                # Handle unit suffixes (Cr, Lac, etc.)
-                if 'cr' in cleaned.lower():
-                    return value  # Already in crores
-                elif 'lac' in cleaned.lower() or 'lakh' in cleaned.lower():
-                    return value / 100  # Convert lakhs to crores
-                elif '%' in cleaned:
-                    return value  # Percentage value
-                
-                return value
-        except (ValueError, AttributeError) as e:
-            logger.debug(f"Could not parse value '{text}': {e}")
-        
-        return None
+        return _parse_cell_value(text)
     
     def scrape_company(self, company_name: str) -> Dict[str, Dict]:
         """
@@ -296,28 +469,52 @@ class MoneycontrolScraper:
         
         return quarterly_data
     
-    def scrape_multiple_companies(self, companies: List[str]) -> Dict[str, Dict]:
+    async def ascrape_many(self, companies: List[str], concurrency: int = 8) -> Dict[str, Dict]:
         """
-        Scrape data for multiple companies
+        Scrape several companies concurrently
+        
+        Each company's fetch + parse runs on a worker thread, so one page is parsed
+        while others are still downloading over the shared session.
         
         Args:
             companies: List of company names
+            concurrency: Maximum pages in flight at once
             
         Returns:
-            Dictionary mapping company to quarterly data
+            Dictionary mapping company to quarterly data (companies with no data omitted)
         """
-        all_data = {}
+        semaphore = asyncio.Semaphore(max(1, concurrency))
         
-        for company in companies:
-            try:
-                data = self.scrape_company(company)
-                if data:
-                    all_data[company] = data
-            except Exception as e:
-                logger.error(f"Error scraping {company}: {e}")
+        async def scrape(company: str) -> Dict[str, Dict]:
+            async with semaphore:
+                return await asyncio.to_thread(self.scrape_company, company)
         
+        outcomes = await asyncio.gather(*(scrape(company) for company in companies),
+                                        return_exceptions=True)
+        
+        all_data = {}
+        for company, outcome in zip(companies, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Error scraping {company}: {outcome}")
+            elif outcome:
+                all_data[company] = outcome
+        
+        logger.debug(f"Cell value cache: {_parse_cell_value.cache_info()}")
         return all_data
     
+    def scrape_multiple_companies(self, companies: List[str], concurrency: int = 8) -> Dict[str, Dict]:
+        """
+        Scrape data for multiple companies
+        
+        Args:
+            companies: List of company names
+            concurrency: Maximum pages in flight at once
+            
+        Returns:
+            Dictionary mapping company to quarterly data
+        """
+        return asyncio.run(self.ascrape_many(companies, concurrency))
+    
     def extract_specific_quarter(self, company_name: str, quarter: str, year: Optional[int] = None) -> Optional[Dict]:
         """
         Extract data for a specific company quarter
@@ -331,11 +528,23 @@ class MoneycontrolScraper:
             Dictionary of financial indicators or None
         """
         quarterly_data = self.scrape_company(company_name)
+        data = self.select_quarter(quarterly_data, quarter, year)
         
-        # Find matching quarter
-        quarter_upper = quarter.upper()
-        if quarter_upper in quarterly_data:
-            return quarterly_data[quarter_upper]
+        if data is None:
+            logger.warning(f"Quarter {quarter} not found for {company_name}")
+        return data
+    
+    def select_quarter(self, quarterly_data: Dict[str, Dict], quarter: str,
+                       year: Optional[int] = None) -> Optional[Dict]:
+        """
+        Pick one quarter out of already scraped scrape_company() output
         
-        logger.warning(f"Quarter {quarter} not found for {company_name}")
-        return None
+        Args:
+            quarterly_data: Result of scrape_company
+            quarter: Quarter (Q1, Q2, Q3, Q4)
+            year: Year (optional, unused - the table is keyed by quarter only)
+            
+        Returns:
+            Dictionary of financial indicators or None
+        """
+        return quarterly_data.get(quarter.upper())
@@ -2,14 +2,160 @@
 # Uses correct Moneycontrol URL patterns and company codes
 
 import re
+import sys
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 from bs4 import BeautifulSoup
 from config.logging_config import get_logger
+from config.settings import MONEYCONTROL_CACHE_DIR, MONEYCONTROL_PAGE_CACHE
+from core.cache_manager import CacheManager
+from utils.alias_matcher import AliasMatcher
+from utils.page_cache import shared_page_cache
+from utils.rate_limit import TokenBucket
 from config.company_config import company_config
 
+try:
+    import lxml.html  # optional, C-backed parsing and tree walking
+except ImportError:
+    lxml = None
+
 logger = get_logger('moneycontrol_scraper_v2')
 
+# Quarter headers: "Sep 2024" / "Jun '24" first, then "Q1 FY25" / "Q2 2024"
+_MONTH_YEAR_RE = re.compile(r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s*[\'"]?(\d{2,4})', re.I)
+_QUARTER_RE = re.compile(r'(Q[1-4])\s*(?:FY)?[\'"]?(\d{2,4})?', re.I)
+_CURRENCY_RE = re.compile(r'[₹$€£]')
+_VALUE_RE = re.compile(r'(-?[\d.]+)')
+# A bare (optionally negative) number like '-1,234.5' - the common cell, parsed without the cleanup passes
+_PLAIN_NUMBER_RE = re.compile(r'-?[\d,]*\d(?:\.\d+)?')
+# Month number (1-12, from the position in _MONTH_ABBRS) -> quarter label
+_MONTH_ABBRS = 'JanFebMarAprMayJunJulAugSepOctNovDec'
+_MONTH_TO_QUARTER = (None, 'Q3', 'Q3', 'Q4', 'Q1', 'Q1', 'Q1', 'Q2', 'Q2', 'Q2', 'Q3', 'Q3', 'Q3')
+# Class names of div/span value holders on newer page layouts
+_DATA_CLASS_RE = re.compile(r'(value|data|amount|number)', re.I)
+
+
+@lru_cache(maxsize=8192)
+def _parse_cell_value(text: str) -> Optional[float]:
+    """Parse a table cell's numeric value; pure, and cells like '-' or '0.00' repeat, so cached"""
+    if not text or text.strip() in ['-', '--', 'N/A', 'NA', '']:
+        return None
+    
+    plain = _PLAIN_NUMBER_RE.fullmatch(text.strip())
+    if plain:
+        return float(plain.group().replace(',', ''))
+    
+    try:
+        # Clean the text
+        cleaned = text.replace(',', '').replace('Rs', '').replace('INR', '').strip()
+        cleaned = _CURRENCY_RE.sub('', cleaned)
+        
+        # Handle parentheses for negative numbers
+        if '(' in cleaned and ')' in cleaned:
+            cleaned = '-' + cleaned.replace('(', '').replace(')', '')
+        
+        # Extract number
+        match = _VALUE_RE.search(cleaned)
+        if match:
+            value = float(match.group(1))
+            
+            # Handle unit suffixes
+            text_lower = text.lower()
+            if 'cr' in text_lower or 'crore' in text_lower:
+                return value
+            elif 'lac' in text_lower or 'lakh' in text_lower:
+                return value / 100
+            elif 'million' in text_lower:
+                return value / 10  # Approximate conversion
+            elif 'billion' in text_lower:
+                return value * 100  # Approximate conversion
+            
+            return value
+            
+    except (ValueError, AttributeError):
+        pass
+    
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _parse_quarter_header_cached(header_clean: str) -> Optional[Tuple[str, Optional[int], str, str]]:
+    """
+    Parse a stripped quarter header into (quarter, year, key, header)
+    
+    Pure, and the same few headers repeat on every table and page, so cached.
+    """
+    # Patterns to match: "Sep 2024", "Jun 2024", "Mar 2024", "Dec 2023"
+    # Also: "Q1 FY25", "Q2 2024", etc.
+    
+    # Month-Year pattern (Sep 2024, Jun 2024, etc.)
+    month_year = _MONTH_YEAR_RE.search(header_clean)
+    if month_year:
+        month = month_year.group(1).capitalize()
+        year_str = month_year.group(2)
+        year = int(year_str) if len(year_str) == 4 else 2000 + int(year_str)
+        
+        # Map month to quarter
+        quarter = _MONTH_TO_QUARTER[_MONTH_ABBRS.index(month) // 3 + 1]
+        
+        return quarter, year, sys.intern(f"{quarter}_{year}"), header_clean
+    
+    # Q1/Q2/Q3/Q4 pattern
+    quarter_match = _QUARTER_RE.search(header_clean)
+    if quarter_match:
+        quarter = quarter_match.group(1).upper()
+        year_str = quarter_match.group(2)
+        year = None
+        if year_str:
+            year = int(year_str) if len(year_str) == 4 else 2000 + int(year_str)
+        
+        # Interned: the same few keys index every parsed table
+        return quarter, year, sys.intern(f"{quarter}_{year}" if year else quarter), header_clean
+    
+    return None
+
+
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Process-wide Moneycontrol session, so every scraper instance shares one
+    keep-alive pool (TLS handshakes are paid once per connection, not per scraper)
+    
+    Transient failures (5xx, connection resets) are retried with short backoff by
+    the adapter. 429 is not retried here - throttling is left to the scrapers'
+    rate limiters - and server-sent Retry-After waits are never honoured, so a
+    bad header cannot stall a worker thread.
+    """
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            session = requests.Session()
+            session.headers.update({
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.5',
+                'Connection': 'keep-alive',
+            })
+            retries = Retry(total=3, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504),
+                            respect_retry_after_header=False)
+            adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20, max_retries=retries)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _SESSION = session
+        return _SESSION
+
+
+def _element_text(element) -> str:
+    """An lxml element's text, stripped per text node the way BeautifulSoup's get_text(strip=True) is"""
+    return ''.join(text.strip() for text in element.itertext())
+
 
 class MoneycontrolScraperV2:
     """Scrape quarterly financial data from Moneycontrol portal - Version 2"""
@@ -34,16 +180,30 @@ class MoneycontrolScraperV2:
         'eps': ['EPS', 'Basic EPS', 'Diluted EPS', 'Earnings Per Share'],
     }
     
-    def __init__(self, timeout: int = 15):
-        """Initialize scraper"""
+    # (indicator key, lowercased alias, 5-char prefix for long aliases) in INDICATORS order
+    _MATCHER = AliasMatcher((key, alias.lower(), alias.lower()[:5] if len(alias) > 5 else None)
+                            for key, aliases in INDICATORS.items() for alias in aliases)
+    
+    # Row label -> matched indicator; labels repeat across tables and companies
+    _indicator_cache: Dict[str, Optional[str]] = {}
+    _INDICATOR_CACHE_SIZE = 4096
+    
+    # How long a parsed page is served from the cache manager
+    PARSED_TTL_SECONDS = 6 * 3600
+    
+    def __init__(self, timeout: int = 15, use_page_cache: bool = MONEYCONTROL_PAGE_CACHE,
+                 max_rps: float = 2.0, burst: int = 4, keep_raw: bool = True,
+                 cache_manager: Optional[CacheManager] = None):
+        """Initialize scraper (use_page_cache: reuse pages fetched today from disk;
+        max_rps/burst: token-bucket pacing of network requests; keep_raw: store each
+        value's source cell text as 'raw_text'; cache_manager: cache parsed pages so
+        repeat scrapes skip both fetch and parse)"""
         self.timeout = timeout
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Connection': 'keep-alive',
-        })
+        self.keep_raw = keep_raw
+        self.cache_manager = cache_manager
+        self.page_cache = shared_page_cache(MONEYCONTROL_CACHE_DIR) if use_page_cache else None
+        self._rate_limiter = TokenBucket(max_rps, burst)
+        self.session = get_session()
     
     def get_quarterly_url(self, company_name: str) -> Optional[str]:
         """Get Moneycontrol quarterly results URL for company"""
@@ -53,6 +213,11 @@ class MoneycontrolScraperV2:
         """Fetch HTML content from URL"""
         try:
             logger.info(f"Fetching: {url}")
+            if self.page_cache is not None:
+                return self.page_cache.fetch(self.session, url, self.timeout,
+                                             throttle=self._rate_limiter.acquire)
+            
+            self._rate_limiter.acquire()
             response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
             return response.text
@@ -62,16 +227,20 @@ class MoneycontrolScraperV2:
     
     def parse_quarterly_table(self, html: str, company: str) -> Dict[str, Dict]:
         """Parse quarterly financial data from HTML"""
-        soup = BeautifulSoup(html, 'html.parser')
         quarterly_data = {}
+        if not html or not html.strip():
+            return quarterly_data
         
         try:
-            # Find all tables
-            tables = soup.find_all('table')
-            logger.info(f"Found {len(tables)} tables on page for {company}")
+            # lxml's tree is walked directly; BeautifulSoup is the pure-Python fallback
+            root = lxml.html.fromstring(html) if lxml is not None else BeautifulSoup(html, 'html.parser')
+            
+            # Find all tables with quarter columns
+            tables = self._table_rows(root)
+            logger.info(f"Found {len(tables)} quarterly tables on page for {company}")
             
-            for table in tables:
-                table_data = self._extract_table_data(table)
+            for rows in tables:
+                table_data = self._extract_table_data(rows)
                 if table_data:
                     # Merge data
                     for quarter, indicators in table_data.items():
@@ -80,7 +249,7 @@ class MoneycontrolScraperV2:
                         quarterly_data[quarter].update(indicators)
             
             # Also try to extract from div-based layouts
-            div_data = self._extract_from_divs(soup)
+            div_data = self._extract_from_divs(root)
             if div_data:
                 for quarter, indicators in div_data.items():
                     if quarter not in quarterly_data:
@@ -94,21 +263,50 @@ class MoneycontrolScraperV2:
             logger.error(f"Error parsing HTML for {company}: {e}")
             return quarterly_data
     
-    def _extract_table_data(self, table) -> Dict[str, Dict]:
-        """Extract financial data from a table element"""
+    @classmethod
+    def _table_rows(cls, root) -> List[List[List[str]]]:
+        """
+        Cell texts (stripped per text node, like get_text(strip=True)) of every row of
+        every table whose header row names a quarter; other tables' bodies are never read
+        """
+        tables = []
+        
+        if isinstance(root, BeautifulSoup):
+            for table in root.find_all('table'):
+                rows = table.find_all('tr')
+                if rows:
+                    headers = [cell.get_text(strip=True) for cell in rows[0].find_all(['td', 'th'])]
+                    if cls._looks_quarterly(headers):
+                        tables.append([headers] + [[cell.get_text(strip=True) for cell in row.find_all(['td', 'th'])]
+                                                   for row in rows[1:]])
+            return tables
+        
+        for table in root.iter('table'):
+            rows = table.iter('tr')
+            header_row = next(rows, None)
+            if header_row is not None:
+                headers = [_element_text(cell) for cell in header_row.iter('td', 'th')]
+                if cls._looks_quarterly(headers):
+                    tables.append([headers] + [[_element_text(cell) for cell in row.iter('td', 'th')]
+                                               for row in rows])
+        return tables
+    
+    @staticmethod
+    def _looks_quarterly(headers: List[str]) -> bool:
+        """Cheap pre-check: could any header be a quarter? (one scan per pattern over the whole row)"""
+        joined = ''.join(headers)
+        return bool(_MONTH_YEAR_RE.search(joined) or _QUARTER_RE.search(joined))
+    
+    def _extract_table_data(self, rows: List[List[str]]) -> Dict[str, Dict]:
+        """Extract financial data from one table's rows of cell text (first row is the header)"""
         quarterly_data = {}
         
         try:
-            rows = table.find_all('tr')
             if not rows or len(rows) < 2:
                 return quarterly_data
             
             # Get headers
-            header_row = rows[0]
-            headers = []
-            for cell in header_row.find_all(['th', 'td']):
-                text = cell.get_text(strip=True)
-                headers.append(text)
+            headers = rows[0]
             
             if not headers:
                 return quarterly_data
@@ -123,34 +321,39 @@ class MoneycontrolScraperV2:
             if not quarter_cols:
                 return quarterly_data
             
-            # Extract data rows
-            for row in rows[1:]:
-                cells = row.find_all(['td', 'th'])
-                if not cells:
-                    continue
-                
-                cell_texts = [c.get_text(strip=True) for c in cells]
-                if not cell_texts:
-                    continue
-                
-                indicator_name = cell_texts[0]
-                matched_indicator = self._match_indicator(indicator_name)
-                
-                if matched_indicator:
-                    for col_idx, quarter_info in quarter_cols.items():
-                        if col_idx < len(cell_texts):
-                            value = self._parse_value(cell_texts[col_idx])
-                            if value is not None:
-                                quarter_key = quarter_info['key']
-                                if quarter_key not in quarterly_data:
-                                    quarterly_data[quarter_key] = {}
-                                
-                                quarterly_data[quarter_key][matched_indicator] = {
-                                    'value': value,
-                                    'confidence': 0.95,
-                                    'raw_text': cell_texts[col_idx],
-                                    'year': quarter_info.get('year')
-                                }
+            # Indicator rows first, so each quarter column's cells are parsed in one map()
+            matched_rows = []
+            for cell_texts in rows[1:]:
+                if cell_texts:
+                    matched_indicator = self._match_indicator(cell_texts[0])
+                    if matched_indicator:
+                        matched_rows.append((matched_indicator, cell_texts))
+            
+            columns = {
+                col_idx: list(map(self._parse_value, (cells[col_idx] if col_idx < len(cells) else ''
+                                                      for _, cells in matched_rows)))
+                for col_idx in quarter_cols
+            }
+            
+            # (column, quarter key, year) looked up once per table, not per cell
+            quarter_slots = [(col_idx, info['key'], info.get('year')) for col_idx, info in quarter_cols.items()]
+            keep_raw = self.keep_raw
+            
+            # Assemble in row order, so later rows still override earlier ones
+            for row_idx, (matched_indicator, cell_texts) in enumerate(matched_rows):
+                for col_idx, quarter_key, year in quarter_slots:
+                    value = columns[col_idx][row_idx]
+                    if value is not None:
+                        if quarter_key not in quarterly_data:
+                            quarterly_data[quarter_key] = {}
+                        
+                        # Built as one literal; callers update and serialise records as plain dicts
+                        if keep_raw:
+                            record = {'value': value, 'confidence': 0.95,
+                                      'raw_text': cell_texts[col_idx], 'year': year}
+                        else:
+                            record = {'value': value, 'confidence': 0.95, 'year': year}
+                        quarterly_data[quarter_key][matched_indicator] = record
             
             return quarterly_data
             
@@ -158,7 +361,7 @@ class MoneycontrolScraperV2:
             logger.debug(f"Error extracting table data: {e}")
             return quarterly_data
     
-    def _extract_from_divs(self, soup) -> Dict[str, Dict]:
+    def _extract_from_divs(self, root) -> Dict[str, Dict]:
         """Extract data from div-based layouts (modern Moneycontrol pages)"""
         quarterly_data = {}
         
@@ -167,10 +370,14 @@ class MoneycontrolScraperV2:
             # This handles the newer Moneycontrol page layouts
             
             # Find elements with financial data
-            data_elements = soup.find_all(['div', 'span'], class_=re.compile(r'(value|data|amount|number)', re.I))
+            if isinstance(root, BeautifulSoup):
+                data_elements = root.find_all(['div', 'span'], class_=_DATA_CLASS_RE)
+            else:
+                data_elements = [elem for elem in root.iter('div', 'span')
+                                 if _DATA_CLASS_RE.search(elem.get('class', ''))]
             
             for elem in data_elements:
-                text = elem.get_text(strip=True)
+                text = elem.get_text(strip=True) if isinstance(root, BeautifulSoup) else _element_text(elem)
                 # Try to extract quarter and value pairs
                 # This is a fallback for non-table layouts
                 
@@ -185,51 +392,12 @@ class MoneycontrolScraperV2:
         if not header:
             return None
         
-        header_clean = header.strip()
-        
-        # Patterns to match: "Sep 2024", "Jun 2024", "Mar 2024", "Dec 2023"
-        # Also: "Q1 FY25", "Q2 2024", etc.
-        
-        # Month-Year pattern (Sep 2024, Jun 2024, etc.)
-        month_year = re.search(r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s*[\'"]?(\d{2,4})', header_clean, re.I)
-        if month_year:
-            month = month_year.group(1).capitalize()
-            year_str = month_year.group(2)
-            year = int(year_str) if len(year_str) == 4 else 2000 + int(year_str)
-            
-            # Map month to quarter
-            month_to_quarter = {
-                'Jan': 'Q3', 'Feb': 'Q3', 'Mar': 'Q4',
-                'Apr': 'Q1', 'May': 'Q1', 'Jun': 'Q1',
-                'Jul': 'Q2', 'Aug': 'Q2', 'Sep': 'Q2',
-                'Oct': 'Q3', 'Nov': 'Q3', 'Dec': 'Q3'
-            }
-            quarter = month_to_quarter.get(month, 'Q1')
-            
-            return {
-                'quarter': quarter,
-                'year': year,
-                'key': f"{quarter}_{year}",
-                'header': header_clean
-            }
-        
-        # Q1/Q2/Q3/Q4 pattern
-        quarter_match = re.search(r'(Q[1-4])\s*(?:FY)?[\'"]?(\d{2,4})?', header_clean, re.I)
-        if quarter_match:
-            quarter = quarter_match.group(1).upper()
-            year_str = quarter_match.group(2)
-            year = None
-            if year_str:
-                year = int(year_str) if len(year_str) == 4 else 2000 + int(year_str)
-            
-            return {
-                'quarter': quarter,
-                'year': year,
-                'key': f"{quarter}_{year}" if year else quarter,
-                'header': header_clean
-            }
+        parsed = _parse_quarter_header_cached(header.strip())
+        if parsed is None:
+            return None
         
-        return None
+        quarter, year, key, header_clean = parsed
+        return {'quarter': quarter, 'year': year, 'key': key, 'header': header_clean}
     
     def _match_indicator(self, text: str) -> Optional[str]:
         """Match text to known financial indicator"""
@@ -238,53 +406,21 @@ class MoneycontrolScraperV2:
         
         text_lower = text.lower().strip()
         
-        for indicator_key, aliases in self.INDICATORS.items():
-            for alias in aliases:
-                alias_lower = alias.lower()
-                if alias_lower in text_lower or text_lower in alias_lower:
-                    return indicator_key
-                # Also check for partial matches
-                if len(alias_lower) > 5 and alias_lower[:5] in text_lower:
-                    return indicator_key
+        try:
+            return self._indicator_cache[text_lower]
+        except KeyError:
+            pass
         
-        return None
+        # First indicator (in INDICATORS order) matching fully, or on a long alias's prefix
+        matched = self._MATCHER.match(text_lower)
+        
+        if len(self._indicator_cache) < self._INDICATOR_CACHE_SIZE:
+            self._indicator_cache[text_lower] = matched
+        return matched
     
     def _parse_value(self, text: str) -> Optional[float]:
         """Parse numerical value from text"""
-        if not text or text.strip() in ['-', '--', 'N/A', 'NA', '']:
-            return None
-        
-        try:
-            # Clean the text
-            cleaned = text.replace(',', '').replace('Rs', '').replace('INR', '').strip()
-            cleaned = re.sub(r'[₹$€£]', '', cleaned)
-            
-            # Handle parentheses for negative numbers
-            if '(' in cleaned and ')' in cleaned:
-                cleaned = '-' + cleaned.replace('(', '').replace(')', '')
-            
-            # Extract number
-            match = re.search(r'(-?[\d.]+)', cleaned)
-            if match:
-                value = float(match.group(1))
-                
-                # Handle unit suffixes
-                text_lower = text.lower()
-                if 'cr' in text_lower or 'crore' in text_lower:
-                    return value
-                elif 'lac' in text_lower or 'lakh' in text_lower:
-                    return value / 100
-                elif 'million' in text_lower:
-                    return value / 10  # Approximate conversion
-                elif 'billion' in text_lower:
-                    return value * 100  # Approximate conversion
-                
-                return value
-                
-        except (ValueError, AttributeError):
-            pass
-        
-        return None
+        return _parse_cell_value(text)
     
     def scrape_company(self, company_name: str) -> Dict[str, Dict]:
         """Scrape all quarterly data for a company"""
@@ -294,6 +430,14 @@ class MoneycontrolScraperV2:
             logger.error(f"No URL found for company: {company_name}")
             return {}
         
+        cache_key = {'source': 'moneycontrol_v2', 'company': company_name, 'url': url,
+                     'keep_raw': self.keep_raw}
+        if self.cache_manager:
+            cached = self.cache_manager.get(cache_key)
+            if cached is not None:
+                logger.info(f"Using cached Moneycontrol data for {company_name}")
+                return cached
+        
         html = self.fetch_page(url)
         
         if not html:
@@ -304,6 +448,8 @@ class MoneycontrolScraperV2:
         
         if quarterly_data:
             logger.info(f"Successfully scraped {company_name}: {len(quarterly_data)} quarters")
+            if self.cache_manager:
+                self.cache_manager.set(cache_key, quarterly_data, ttl_seconds=self.PARSED_TTL_SECONDS)
         else:
             logger.warning(f"No quarterly data found for {company_name}")
         
@@ -313,7 +459,11 @@ class MoneycontrolScraperV2:
                                 year: Optional[int] = None) -> Optional[Dict]:
         """Extract data for a specific company quarter"""
         quarterly_data = self.scrape_company(company_name)
-        
+        return self.select_quarter(quarterly_data, quarter, year)
+    
+    def select_quarter(self, quarterly_data: Dict[str, Dict], quarter: str,
+                       year: Optional[int] = None) -> Optional[Dict]:
+        """Pick one quarter out of already scraped scrape_company() output"""
         if not quarterly_data:
             return None
         
@@ -351,3 +501,4 @@ class MoneycontrolScraperV2:
     def remove_company(self, name: str) -> bool:
         """Remove a company"""
         return company_config.remove_company(name)
+
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Show summary of research results"""
 import sys
+from itertools import islice
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
@@ -33,7 +34,7 @@ for research in all_research:
     extracted = research.get('extracted_data', {})
     if extracted:
         print("  Top indicators:")
-        for i, (indicator, data) in enumerate(list(extracted.items())[:3]):
+        for i, (indicator, data) in enumerate(islice(extracted.items(), 3)):
             print(f"    {indicator}: ₹{data['value']:.2f} Cr (conf: {data['confidence']:.2f})")
 
 print('\n' + '='*60)
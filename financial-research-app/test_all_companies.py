@@ -2,6 +2,7 @@
 """Test all companies for Q2 2025"""
 
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
@@ -33,32 +34,39 @@ hybrid = HybridDataSource(client)
 companies = company_config.get_all_companies()
 print(f"\nTesting {len(companies)} companies...\n")
 
-results = []
-for company in companies:  # Test all companies
-    print(f"[TEST] {company} Q2 2025...", end=" ", flush=True)
+def check_company(company):
+    """Run one company; returns its (company, status, indicators, source or error) row"""
     try:
         result = hybrid.extract_financial_data(company, 'Q2', 2025)
         indicators = len(result.get('extracted_data', {}))
-        source = result.get('source', 'None')
         
         if indicators > 0:
-            print(f"✓ {indicators} indicators from {source}")
-            results.append((company, 'OK', indicators, source))
-        else:
-            print(f"✗ No data - {result.get('error', 'Unknown')[:30]}")
-            results.append((company, 'FAIL', 0, source))
+            return (company, 'OK', indicators, result.get('source', 'None'))
+        return (company, 'FAIL', 0, f"No data - {result.get('error', 'Unknown')[:30]}")
     except Exception as e:
-        print(f"✗ Error: {str(e)[:40]}")
-        results.append((company, 'ERROR', 0, str(e)[:30]))
+        return (company, 'ERROR', 0, str(e)[:30])
 
-print("\n" + "="*70)
-print("  SUMMARY")
-print("="*70)
-print(f"\n{'Company':<20} {'Status':<8} {'Indicators':<12} {'Source'}")
-print("-"*70)
-for company, status, indicators, source in results:
-    status_icon = "✓" if status == "OK" else "✗"
-    print(f"{company:<20} {status_icon} {status:<6} {indicators:<12} {source}")
+# Companies are independent - overlap their network waits (the clients keep their own rate limits);
+# nothing is printed until all of them are done
+by_company = {}
+with ThreadPoolExecutor(max_workers=max(1, min(8, len(companies)))) as executor:
+    futures = {executor.submit(check_company, company): company for company in companies}
+    for future in as_completed(futures):
+        by_company[futures[future]] = future.result()
+
+# Summary in the original company order
+results = [by_company[company] for company in companies]
 
+rows = "\n".join(f"{company:<20} {'✓' if status == 'OK' else '✗'} {status:<6} {indicators:<12} {source}"
+                 for company, status, indicators, source in results)
 success = sum(1 for r in results if r[1] == 'OK')
-print(f"\nSuccess: {success}/{len(results)} companies")
+
+print("\n" + "\n".join([
+    "=" * 70,
+    "  SUMMARY",
+    "=" * 70,
+    f"\n{'Company':<20} {'Status':<8} {'Indicators':<12} {'Source / error'}",
+    "-" * 70,
+    rows,
+    f"\nSuccess: {success}/{len(results)} companies",
+]))
@@ -0,0 +1,81 @@
+# Alias Matcher
+# First-match lookup of indicator aliases in a row label, without a Python loop per alias
+
+import sys
+from bisect import bisect_right
+from typing import Iterable, Optional, Tuple
+
+try:
+    import ahocorasick  # optional, scans a label for every alias in one pass
+except ImportError:
+    ahocorasick = None
+
+
+class AliasMatcher:
+    """
+    Find the first alias entry (in priority order) that matches a lowercased label
+
+    An entry (key, alias, prefix) matches when the alias is in the label, the label
+    is in the alias, or the optional prefix is in the label - the same rule the
+    scrapers used to apply alias by alias.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str, Optional[str]]]):
+        """
+        Initialize matcher
+
+        Args:
+            entries: (indicator key, lowercased alias, lowercased prefix or None), highest priority first
+        """
+        # Keys are interned: they become dict keys in every parsed table
+        self._entries = tuple((sys.intern(key), alias, prefix) for key, alias, prefix in entries)
+
+        # "label in alias": one str.find over all aliases; the hit offset gives the entry
+        self._joined = '\n'.join(alias for _, alias, _ in self._entries)
+        self._starts = []
+        offset = 0
+        for _, alias, _ in self._entries:
+            self._starts.append(offset)
+            offset += len(alias) + 1
+
+        # "alias/prefix in label": an automaton reporting the best entry per word
+        self._automaton = None
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for index, (_, alias, prefix) in enumerate(self._entries):
+                for word in (alias, prefix) if prefix else (alias,):
+                    if word and automaton.get(word, index) >= index:
+                        automaton.add_word(word, index)
+            if len(automaton):
+                automaton.make_automaton()
+                self._automaton = automaton
+
+    def match(self, text_lower: str) -> Optional[str]:
+        """
+        Match a label to an indicator key
+
+        Args:
+            text_lower: Lowercased, stripped label
+
+        Returns:
+            Key of the first matching entry, or None
+        """
+        best = len(self._entries)
+
+        if '\n' not in text_lower:
+            pos = self._joined.find(text_lower)
+            if pos >= 0:
+                best = bisect_right(self._starts, pos) - 1
+
+        if self._automaton is not None:
+            for _, index in self._automaton.iter(text_lower):
+                if index < best:
+                    best = index
+        else:
+            for index in range(best):
+                _, alias, prefix = self._entries[index]
+                if alias in text_lower or (prefix and prefix in text_lower):
+                    best = index
+                    break
+
+        return self._entries[best][0] if best < len(self._entries) else None
@@ -0,0 +1,152 @@
+# Fan-out Helpers
+# Run one extraction per (company, quarter) concurrently and regroup the results
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List
+from config.logging_config import get_logger
+
+logger = get_logger('fan_out')
+
+
+def _error_result(company: str, quarter: str, year: int, error: Exception) -> Dict:
+    """Result placeholder for a (company, quarter) whose extraction raised"""
+    logger.error(f"Error extracting {company} {quarter}: {error}")
+    return {
+        'company': company,
+        'quarter': quarter,
+        'year': year,
+        'error': str(error),
+        'extracted_data': {}
+    }
+
+
+async def gather_company_quarters(extract: Callable[[str, str, int], Dict], companies: List[str],
+                                  quarters: List[str], year: int,
+                                  max_concurrency: int = 4) -> Dict[str, Dict]:
+    """
+    Run a blocking extract(company, quarter, year) for every pair on worker threads
+
+    Args:
+        extract: Blocking per-quarter extraction function
+        companies: List of company names
+        quarters: List of quarters
+        year: Financial year
+        max_concurrency: Maximum extractions in flight at once
+
+    Returns:
+        Dictionary mapping company to {quarter: result}, in input order
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    pairs = [(company, quarter) for company in companies for quarter in quarters]
+
+    async def run(company: str, quarter: str) -> Dict:
+        async with semaphore:
+            return await asyncio.to_thread(extract, company, quarter, year)
+
+    outcomes = await asyncio.gather(*(run(company, quarter) for company, quarter in pairs),
+                                    return_exceptions=True)
+
+    all_results = {company: {} for company in companies}
+    for (company, quarter), outcome in zip(pairs, outcomes):
+        if isinstance(outcome, Exception):
+            outcome = _error_result(company, quarter, year, outcome)
+        all_results[company][quarter] = outcome
+
+    return all_results
+
+
+def run_company_quarters(extract: Callable[[str, str, int], Dict], companies: List[str],
+                         quarters: List[str], year: int, max_workers: int = 8) -> Dict[str, Dict]:
+    """
+    Sync counterpart of gather_company_quarters backed by a thread pool
+
+    Args:
+        extract: Blocking per-quarter extraction function
+        companies: List of company names
+        quarters: List of quarters
+        year: Financial year
+        max_workers: Thread pool size
+
+    Returns:
+        Dictionary mapping company to {quarter: result}, in input order
+    """
+    # Pre-seed so the output keeps input order regardless of completion order
+    all_results = {company: {quarter: None for quarter in quarters} for company in companies}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {executor.submit(extract, company, quarter, year): (company, quarter)
+                   for company in companies for quarter in quarters}
+        for future in as_completed(futures):
+            company, quarter = futures[future]
+            try:
+                all_results[company][quarter] = future.result()
+            except Exception as e:
+                all_results[company][quarter] = _error_result(company, quarter, year, e)
+
+    return all_results
+
+
+async def gather_companies(extract_company: Callable[[str, List[str], int], Dict[str, Dict]],
+                           companies: List[str], quarters: List[str], year: int,
+                           max_concurrency: int = 4) -> Dict[str, Dict]:
+    """
+    Like gather_company_quarters, for extractors that fetch all of a company's quarters at once
+
+    Args:
+        extract_company: Blocking extract_company(company, quarters, year) -> {quarter: result}
+        companies: List of company names
+        quarters: List of quarters
+        year: Financial year
+        max_concurrency: Maximum companies in flight at once
+
+    Returns:
+        Dictionary mapping company to {quarter: result}, in input order
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(company: str) -> Dict[str, Dict]:
+        async with semaphore:
+            return await asyncio.to_thread(extract_company, company, quarters, year)
+
+    outcomes = await asyncio.gather(*(run(company) for company in companies), return_exceptions=True)
+
+    all_results = {}
+    for company, outcome in zip(companies, outcomes):
+        if isinstance(outcome, Exception):
+            outcome = {quarter: _error_result(company, quarter, year, outcome) for quarter in quarters}
+        all_results[company] = outcome
+
+    return all_results
+
+
+def run_companies(extract_company: Callable[[str, List[str], int], Dict[str, Dict]],
+                  companies: List[str], quarters: List[str], year: int,
+                  max_workers: int = 8) -> Dict[str, Dict]:
+    """
+    Sync counterpart of gather_companies backed by a thread pool
+
+    Args:
+        extract_company: Blocking extract_company(company, quarters, year) -> {quarter: result}
+        companies: List of company names
+        quarters: List of quarters
+        year: Financial year
+        max_workers: Thread pool size
+
+    Returns:
+        Dictionary mapping company to {quarter: result}, in input order
+    """
+    all_results = {company: None for company in companies}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {executor.submit(extract_company, company, quarters, year): company
+                   for company in companies}
+        for future in as_completed(futures):
+            company = futures[future]
+            try:
+                all_results[company] = future.result()
+            except Exception as e:
+                all_results[company] = {quarter: _error_result(company, quarter, year, e)
+                                        for quarter in quarters}
+
+    return all_results
@@ -0,0 +1,28 @@
+# JSON Codec
+# orjson-backed JSON (de)serialisation with a stdlib fallback
+
+import json
+from typing import Any
+
+try:
+    import orjson  # optional, faster (de)serialisation
+except ImportError:
+    orjson = None
+
+
+def dump_json(data: Any) -> bytes:
+    """Serialise data as indented UTF-8 JSON (orjson when available)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        except TypeError:
+            # orjson is stricter (e.g. non-str keys); the stdlib handles the rest
+            pass
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def load_json(raw: bytes) -> Any:
+    """Parse JSON bytes (orjson when available)"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
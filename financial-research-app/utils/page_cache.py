@@ -0,0 +1,160 @@
+# Page Cache
+# On-disk cache of fetched HTML pages, reused for the day and revalidated with ETags
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, Optional
+import requests
+from config.logging_config import get_logger
+
+logger = get_logger('page_cache')
+
+
+class PageCache:
+    """Gzipped HTML per URL plus an index.json of {url: {file, fetched_on, etag}}"""
+
+    def __init__(self, cache_dir: Path):
+        """
+        Initialize page cache
+
+        Args:
+            cache_dir: Directory for cached pages and the index
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.cache_dir / 'index.json'
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0}
+        self._index = self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """Read index.json, starting empty if it is missing or unreadable"""
+        try:
+            return json.loads(self._index_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable page cache index: {e}")
+            return {}
+
+    def _save_index(self):
+        """Write index.json atomically (caller holds the lock)"""
+        tmp_path = self._index_path.with_name(f"index.json.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(self._index, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self._index_path)
+
+    def _read_page(self, entry: Dict) -> Optional[str]:
+        """Decompress a cached page, or None if its file is gone or corrupt"""
+        try:
+            return gzip.decompress((self.cache_dir / entry['file']).read_bytes()).decode('utf-8')
+        except Exception as e:
+            logger.debug(f"Cached page unreadable: {e}")
+            return None
+
+    def get(self, url: str) -> Optional[str]:
+        """Return the page if it was fetched today, else None"""
+        with self._lock:
+            entry = self._index.get(url)
+
+        if entry and entry.get('fetched_on') == date.today().isoformat():
+            html = self._read_page(entry)
+            if html is not None:
+                self.stats['hits'] += 1
+                logger.debug(f"Page cache hit: {url}")
+                return html
+
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, url: str, html: str, etag: Optional[str] = None):
+        """Store a freshly downloaded page"""
+        filename = f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.html.gz"
+        try:
+            (self.cache_dir / filename).write_bytes(gzip.compress(html.encode('utf-8')))
+            with self._lock:
+                self._index[url] = {'file': filename, 'fetched_on': date.today().isoformat(),
+                                    'etag': etag}
+                self._save_index()
+        except Exception as e:
+            logger.error(f"Error writing page cache: {e}")
+
+    def fetch(self, session: requests.Session, url: str, timeout: float,
+              throttle: Optional[Callable[[], None]] = None) -> str:
+        """
+        Fetch a page through the cache
+
+        Today's copy is returned without a request. Otherwise the request carries
+        the stored ETag, and a 304 reuses the cached body.
+
+        Args:
+            session: HTTP session to fetch with
+            url: Page URL
+            timeout: Request timeout in seconds
+            throttle: Called before every network request (e.g. a rate limiter), never on a hit
+
+        Returns:
+            Page HTML
+
+        Raises:
+            requests.RequestException: If the request fails
+        """
+        html = self.get(url)
+        if html is not None:
+            return html
+
+        with self._lock:
+            entry = self._index.get(url)
+
+        headers = {'If-None-Match': entry['etag']} if entry and entry.get('etag') else None
+        if throttle:
+            throttle()
+        response = session.get(url, timeout=timeout, headers=headers)
+
+        if response.status_code == 304:
+            html = self._read_page(entry)
+            if html is not None:
+                self.stats['revalidated'] += 1
+                with self._lock:
+                    entry['fetched_on'] = date.today().isoformat()
+                    self._save_index()
+                return html
+            # Body lost locally - fetch it again unconditionally
+            if throttle:
+                throttle()
+            response = session.get(url, timeout=timeout)
+
+        response.raise_for_status()
+        self.put(url, response.text, response.headers.get('ETag'))
+        return response.text
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache statistics"""
+        total = self.stats['hits'] + self.stats['misses']
+        hit_rate = (self.stats['hits'] / total * 100) if total > 0 else 0
+
+        return {
+            'hits': self.stats['hits'],
+            'misses': self.stats['misses'],
+            'revalidated': self.stats['revalidated'],
+            'total_requests': total,
+            'hit_rate_percent': round(hit_rate, 2)
+        }
+
+
+_shared_caches: Dict[Path, PageCache] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_page_cache(cache_dir: Path) -> PageCache:
+    """One PageCache per directory per process, so scrapers never overwrite each other's index"""
+    cache_dir = Path(cache_dir)
+    with _shared_lock:
+        cache = _shared_caches.get(cache_dir)
+        if cache is None:
+            cache = _shared_caches[cache_dir] = PageCache(cache_dir)
+        return cache
@@ -2,7 +2,7 @@
 # Real-time progress tracking for research operations
 
 import time
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from config.logging_config import get_logger
 
@@ -36,6 +36,22 @@ class ProgressTracker:
         }
         logger.info(f"Started: {item_id}")
     
+    def start_items(self, items: List[Tuple[str, str]]):
+        """
+        Mark a batch of items as started with a single log line
+        
+        Args:
+            items: (item_id, description) pairs
+        """
+        now = time.time()
+        self.in_progress_items.extend(item_id for item_id, _ in items)
+        self.item_details.update(
+            (item_id, {'status': 'in_progress', 'description': description,
+                       'start_time': now, 'error': None})
+            for item_id, description in items
+        )
+        logger.info(f"Started {len(items)} items")
+    
     def complete_item(self, item_id: str):
         """Mark an item as completed"""
         if item_id in self.in_progress_items:
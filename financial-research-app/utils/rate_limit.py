@@ -0,0 +1,54 @@
+# Rate Limiting
+# Thread-safe token bucket shared by API and scraping callers
+
+import threading
+import time
+from config.logging_config import get_logger
+
+logger = get_logger('rate_limit')
+
+
+class TokenBucket:
+    """Token bucket: refills at `rate` tokens per second up to `capacity`, blocks only when empty"""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+        Initialize token bucket
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size (bucket starts full)
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """Add tokens for the time elapsed since the last refill (caller holds the lock)"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available, without waiting"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self):
+        """Take a token, sleeping until one is available"""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+
+            # Sleep without the lock; another thread may win the token, so re-check
+            logger.debug(f"Rate limit reached, waiting {wait_time:.2f}s")
+            time.sleep(wait_time)